@@ -0,0 +1,148 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, request
+
+# Routes that are more expensive than a single product lookup get their own budget
+DEFAULT_ROUTE_CLASSES = {
+    ("POST", "/products/bulk"): "bulk",
+    ("PUT", "/products/bulk_update"): "bulk",
+    ("GET", "/products"): "listing",
+    ("GET", "/products/export"): "listing",
+    ("POST", "/products/import"): "bulk",
+}
+
+# Route class -> (tokens per second, bucket size) for every client
+DEFAULT_BUDGETS = {
+    "default": (100.0, 200),
+    "listing": (10.0, 20),
+    "bulk": (2.0, 5),
+}
+
+# Route class -> how many requests of that class may run at the same time in this process
+DEFAULT_CONCURRENCY = {
+    "listing": 4,
+    "bulk": 2,
+}
+
+
+class TokenBucket:
+    """
+    Holds up to size tokens and gets rate new tokens per second.
+    A request takes one token, if there is none it has to wait.
+    """
+
+    def __init__(self, rate, size):
+        self.rate = rate
+        self.size = size
+        self.tokens = size
+        self.updated = time.monotonic()
+
+    def take(self):
+        """
+        Takes a token, returns 0 if it worked or the seconds until a token is available
+        """
+        now = time.monotonic()
+        self.tokens = min(self.size, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionControl:
+    """
+    Token buckets per (client, route class) and a concurrency limit per route class.
+    Only the max_clients most recently seen buckets are kept, a dropped bucket just starts full again.
+    """
+
+    def __init__(self, budgets, concurrency, max_clients=10_000):
+        self.budgets = budgets
+        self.limits = {name: threading.BoundedSemaphore(limit) for name, limit in concurrency.items()}
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, client, route_class):
+        rate, size = self.budgets.get(route_class, self.budgets["default"])
+        key = (client, route_class)
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = TokenBucket(rate, size)
+                if len(self.buckets) > self.max_clients:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+            return bucket.take()
+
+    def enter(self, route_class):
+        """
+        Returns the semaphore that was acquired, None if the class has no limit, or False if it is full
+        """
+        semaphore = self.limits.get(route_class)
+        if semaphore is None:
+            return None
+        return semaphore if semaphore.acquire(blocking=False) else False
+
+
+def client_id():
+    """
+    Who sent the request: the client address, or the X-Client-Id header if the app is behind a
+    trusted proxy that sets it (TRUST_CLIENT_ID_HEADER). Clients choose the header themselves,
+    so trusting it directly would let a client get a new budget by sending a new value.
+    """
+    if current_app.config.get("TRUST_CLIENT_ID_HEADER"):
+        return request.headers.get("X-Client-Id") or request.remote_addr
+    return request.remote_addr
+
+
+def too_many_requests(message, retry_after):
+    return {"error": message}, 429, {"Retry-After": str(max(1, math.ceil(retry_after)))}
+
+
+def init_admission(app):
+    """
+    Registers the admission control hooks on the app.
+    Clients are told apart by client_id.
+
+    Config:
+    ADMISSION_ENABLED - turns admission control on
+    TRUST_CLIENT_ID_HEADER - use the X-Client-Id header set by a trusted proxy instead of the client address
+    ADMISSION_ROUTE_CLASSES - (method, url rule) -> route class, other routes are "default"
+    ADMISSION_BUDGETS - route class -> (tokens per second, bucket size) per client
+    ADMISSION_CONCURRENCY - route class -> max requests of that class running at once
+    """
+    app.config.setdefault("ADMISSION_ENABLED", False)
+    app.config.setdefault("TRUST_CLIENT_ID_HEADER", False)
+    app.config.setdefault("ADMISSION_ROUTE_CLASSES", DEFAULT_ROUTE_CLASSES)
+    app.config.setdefault("ADMISSION_BUDGETS", DEFAULT_BUDGETS)
+    app.config.setdefault("ADMISSION_CONCURRENCY", DEFAULT_CONCURRENCY)
+    admission = AdmissionControl(app.config["ADMISSION_BUDGETS"], app.config["ADMISSION_CONCURRENCY"])
+    app.extensions["admission"] = admission
+
+    @app.before_request
+    def admit_request():
+        if not app.config["ADMISSION_ENABLED"] or request.url_rule is None:
+            return None
+        route_class = app.config["ADMISSION_ROUTE_CLASSES"].get((request.method, request.url_rule.rule), "default")
+        wait = admission.take(client_id(), route_class)
+        if wait:
+            return too_many_requests("Rate limit exceeded", wait)
+
+        semaphore = admission.enter(route_class)
+        if semaphore is False:
+            return too_many_requests("Too many requests of this kind are running, try again later", 1)
+        g.admission_semaphore = semaphore
+        return None
+
+    @app.teardown_request
+    def leave_request(exception):
+        semaphore = g.pop("admission_semaphore", None)
+        if semaphore:
+            semaphore.release()
+
+    return admission
@@ -1,105 +1,206 @@
-from flask import Flask, request
+from flask import Blueprint, Flask, current_app, request
 from pydantic import ValidationError
-from schemas import ProductSchema, BulkProductSchema
-
+from schemas import ProductSchema, BulkProductSchema, BatchGetSchema
+from metrics import init_metrics
+from admission import init_admission
+from idempotency import idempotent, init_idempotency
+from changefeed import init_changefeed
+from product_cache import init_product_cache
+from query_cache import init_query_cache
+from catalog_io import init_catalog_io
+from profiling import init_profiling, phase
+from store import ProductStore
+from shared_store import RemoteStore
+from sharded_store import ShardedStore
+from seed import dataset_size, load_dataset
+from search import tokenize
+
+
+bp = Blueprint("products", __name__)
+
+# The snapshot /reset goes back to, it can't be replaced or deleted through the API
+SEED_SNAPSHOT = "seed"
+
+def create_app(config=None, products=None):
+    """
+    Creates an app with its own product store.
+    Every app instance has its own data, so tests can run many apps side by side.
+    products are the starting products, if not given the SEED_DATASET is loaded.
+
+    Config (can also be set with FLASK_ environment variables, e.g. FLASK_SEED_DATASET=large):
+    SEED_DATASET - name of the dataset from seed.py the app starts with and /reset goes back to
+    SEED_SIZE - size of the generated catalog, None uses the size of the dataset
+    SEED_RANDOM_SEED - random seed for generated catalogs
+    RESET_MAX_SIZE - largest size /reset may generate, so a caller can't make the app run out of memory
+    STORE_MODE - "local" keeps the products in this process, "shared" uses the store server
+                 from shared_store.py so all worker processes see the same products,
+                 "sharded" splits the products over shards (see sharded_store.py)
+    STORE_ADDRESS - unix socket path of the store server
+    STORE_AUTHKEY - shared secret of the store server (and of the shard servers)
+    STORE_SHARDS - number of shards kept in this process in sharded mode
+    STORE_SHARD_ADDRESSES - socket paths of shard servers (a list or comma separated), used
+                            instead of shards in this process if set
+    """
+    app = Flask(__name__)
+    app.config.update(
+        SEED_DATASET="default",
+        SEED_SIZE=None,
+        SEED_RANDOM_SEED=0,
+        RESET_MAX_SIZE=1_000_000,
+        STORE_MODE="local",
+        STORE_ADDRESS="/tmp/products.sock",
+        STORE_AUTHKEY="products",
+        STORE_SHARDS=4,
+        STORE_SHARD_ADDRESSES=None,
+    )
+    app.config.from_prefixed_env()
+    if config:
+        app.config.update(config)
+
+    if app.config["STORE_MODE"] == "shared":
+        # The store server loads the seed dataset and takes the seed snapshot
+        store = RemoteStore(app.config["STORE_ADDRESS"], app.config["STORE_AUTHKEY"].encode())
+    elif app.config["STORE_MODE"] == "sharded" and app.config["STORE_SHARD_ADDRESSES"]:
+        # Like the shared store, every shard server loads its part of the seed dataset
+        addresses = app.config["STORE_SHARD_ADDRESSES"]
+        if isinstance(addresses, str):
+            addresses = addresses.split(",")
+        store = ShardedStore([RemoteStore(address, app.config["STORE_AUTHKEY"].encode()) for address in addresses])
+    elif app.config["STORE_MODE"] == "sharded":
+        if products is None:
+            products = load_dataset(app.config["SEED_DATASET"], app.config["SEED_SIZE"], app.config["SEED_RANDOM_SEED"])
+        store = ShardedStore([ProductStore() for _ in range(app.config["STORE_SHARDS"])], products)
+        store.snapshot(SEED_SNAPSHOT)
+    else:
+        if products is None:
+            products = load_dataset(app.config["SEED_DATASET"], app.config["SEED_SIZE"], app.config["SEED_RANDOM_SEED"])
+        store = ProductStore(products)
+        store.snapshot(SEED_SNAPSHOT)
+    app.extensions["store"] = store
+    init_metrics(app, store_size=lambda: len(store))
+    init_admission(app)
+    init_idempotency(app)
+    init_changefeed(app, store)
+    init_product_cache(app, store)
+    init_query_cache(app, store)
+    init_catalog_io(app, store)
+    init_profiling(app)
+    app.after_request(add_header)
+    app.register_blueprint(bp)
+    return app
+
+
+def get_store():
+    """
+    Returns the product store of the current app
+    """
+    return current_app.extensions["store"]
 
-app = Flask(__name__)
-
-# Some data for products
-products = [
-    {
-        "id": 1, 
-        "name": "Laptop", 
-        "price": 800.0, 
-        "category": "Electronics", 
-        "specification": {"color": "black", "weight": 1.5, "height": 2.0, "length": 15.0},
-        "description": "High performance laptop",
-        "stock": 0
-    },
-    {
-        "id": 2, 
-        "name": "T-Shirt", 
-        "price": 20.0, 
-        "category": "Clothing", 
-        "specification": {"color": "white", "weight": 0.2, "height": 1.0, "length": 5.0},
-        "description": "Cotton t-shirt",
-        "stock": 2
-    },
-    {
-        "id": 3, 
-        "name": "Gaming Laptop", 
-        "price": 20.0, 
-        "category": "Electronics", 
-        "specification": {"color": "white", "weight": 30.5, "height": 8.0, "length": 5.0},
-        "description": "Cool gaming laptop",
-        "stock": 4
-    }
-]
 
 def find_product_by_id(product_id):
     """
     Will find a product based on a product id
     """
-    for product in products:
-        if product["id"] == product_id:
-            return product
-    return None
-
+    return get_store().get(product_id)
 
 
-def get_next_id(data: list):
+def cached_query(key, compute):
     """
-    Don't touch this
+    Returns the JSON response of a listing or search from the query cache, compute makes the
+    result on a miss. The X-Cache header says if it was a HIT, a MISS, or COALESCED when it
+    waited for an identical request that was computing the same result.
     """
-    if not data:
-        return 1
-    return max(d['id'] for d in data) + 1
-    
+    def compute_in_store_phase():
+        # The cache serializes the result itself, that is timed as serialization, not store
+        with phase("store"):
+            return compute()
+
+    data, status = current_app.extensions["query_cache"].get_or_compute(key, compute_in_store_phase)
+    response = current_app.response_class(data, 200, mimetype="application/json")
+    response.headers["X-Cache"] = status
+    return response
+
 
-@app.after_request
 def add_header(response):
     """
     Don't touch this
+    Responses that already picked their own type (like /metrics) are left alone
     """
-    response.headers['Content-Type'] = 'application/json'
+    if response.mimetype == current_app.response_class.default_mimetype:
+        response.headers['Content-Type'] = 'application/json'
     return response
 
-@app.get("/reset")
+@bp.get("/reset")
 def reset_products():
-    global products
-    products = [
-    {
-        "id": 1, 
-        "name": "Laptop", 
-        "price": 800.0, 
-        "category": "Electronics", 
-        "specification": {"color": "black", "weight": 1.5, "height": 2.0, "length": 15.0},
-        "description": "High performance laptop",
-        "stock": 0
-    },
-    {
-        "id": 2, 
-        "name": "T-Shirt", 
-        "price": 20.0, 
-        "category": "Clothing", 
-        "specification": {"color": "white", "weight": 0.2, "height": 1.0, "length": 5.0},
-        "description": "Cotton t-shirt",
-        "stock": 2
-    },
-    {
-        "id": 3, 
-        "name": "Gaming Laptop", 
-        "price": 20.0, 
-        "category": "Electronics", 
-        "specification": {"color": "white", "weight": 30.5, "height": 8.0, "length": 5.0},
-        "description": "Cool gaming laptop",
-        "stock": 4
-    }
-]
+    """
+    Puts back the seed dataset of the app, this restores the "seed" snapshot so it is fast for any size.
+    Another dataset can be loaded with the dataset, size and seed query parameters,
+    e.g. /reset?dataset=generated&size=5000&seed=1
+    """
+    config = current_app.config
+    if not request.args:
+        if get_store().restore(SEED_SNAPSHOT):
+            return {}, 200
+        # There is no seed snapshot (e.g. a store server started without one), load the dataset again
+        get_store().reset(load_dataset(config["SEED_DATASET"], config["SEED_SIZE"], config["SEED_RANDOM_SEED"]))
+        get_store().snapshot(SEED_SNAPSHOT)
+        return {}, 200
+
+    dataset = request.args.get("dataset", config["SEED_DATASET"])
+    size = request.args.get("size", config["SEED_SIZE"], type=int)
+    seed = request.args.get("seed", config["SEED_RANDOM_SEED"], type=int)
+    if "size" in request.args and (size is None or size < 1):
+        return {"error": "size has to be at least 1"}, 400
+    # Named datasets and SEED_SIZE count too, not just the size parameter
+    if (dataset_size(dataset, size) or 0) > config["RESET_MAX_SIZE"]:
+        return {"error": f"The dataset can have at most {config['RESET_MAX_SIZE']} products"}, 400
+    try:
+        products = load_dataset(dataset, size, seed)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    get_store().reset(products)
     return {}, 200
 
 
-@app.route("/")
+@bp.get("/snapshots")
+def list_snapshots():
+    """
+    Lists the saved snapshots
+    """
+    return get_store().list_snapshots(), 200
+
+
+@bp.post("/snapshots/<name>")
+def create_snapshot(name):
+    """
+    Saves the current products under name, an existing snapshot with the same name is replaced
+    """
+    if name == SEED_SNAPSHOT:
+        return {"error": "The seed snapshot can't be replaced"}, 403
+    return get_store().snapshot(name), 201
+
+
+@bp.post("/snapshots/<name>/restore")
+def restore_snapshot(name):
+    """
+    Goes back to the products saved under name
+    """
+    if get_store().restore(name):
+        return {}, 200
+    return {"error": "Snapshot not found"}, 404
+
+
+@bp.delete("/snapshots/<name>")
+def delete_snapshot(name):
+    if name == SEED_SNAPSHOT:
+        return {"error": "The seed snapshot can't be deleted"}, 403
+    if get_store().delete_snapshot(name):
+        return {}, 204
+    return {"error": "Snapshot not found"}, 404
+
+
+@bp.route("/")
 def status():
     """
     ---- G -----
@@ -107,40 +208,79 @@ def status():
     """
     return {"message": "ok"}, 200
 
-@app.route("/products", methods=["GET"])
+@bp.route("/products", methods=["GET"])
 def list_products():
     """
     ---- G -----
     Lists all products
     Can filter using a max_price query parameter
+    Responses are cached until the catalog changes
     """
     max_price = request.args.get("max_price", type=float)
-    filtered_products = []
-    
-    if max_price:
-        for product in products:
+
+    def filter_products():
+        if not max_price:
+            return get_store().all()
+        filtered_products = []
+        for product in get_store().all():
             if product["price"] <= max_price:
                 filtered_products.append(product)
-        return filtered_products, 200
-        
-    return products, 200
+        return filtered_products
 
-@app.route("/products/<int:product_id>", methods=["GET"])
+    return cached_query(("list", max_price or None), filter_products)
+
+@bp.route("/products/<int:product_id>", methods=["GET"])
 def get_product_detail(product_id):
     """
     ---- G -----
     Returns a product based on a product id
     """
-    product = find_product_by_id(product_id)
+    with phase("store"):
+        product = find_product_by_id(product_id)
     if product:
         return product, 200
     return {"message": "No product found"}, 404
 
-@app.route("/products", methods=["POST"])
+@bp.route("/products/batch", methods=["POST"])
+def get_products_batch():
+    """
+    Returns many products in one request
+    The found products come in the order of the ids, ids without a product are listed in missing
+    Example JSON input:
+    {
+        "ids": [1, 2, 99]
+    }
+    """
+    try:
+        with phase("validation"):
+            # model_validate also rejects bodies that are not an object, e.g. a bare list of ids
+            ids = BatchGetSchema.model_validate(request.get_json()).ids
+    except ValidationError as e:
+        return e.json(), 400
+
+    cache = current_app.extensions["product_json"]
+    found = []
+    missing = []
+    with phase("store"):
+        for product_id in dict.fromkeys(ids):
+            data = cache.get(product_id)
+            if data is None:
+                missing.append(product_id)
+            else:
+                found.append(data)
+
+    # The products are already JSON, so the body is put together instead of serialized again
+    body = '{"missing":' + current_app.json.dumps(missing) + ',"products":[' + ",".join(found) + "]}"
+    return current_app.response_class(body, 200, mimetype="application/json")
+
+
+@bp.route("/products", methods=["POST"])
+@idempotent
 def create_product():
     """
     ---- G -----
     Creates a product
+    Retries with the same Idempotency-Key header get the first response back
     Example JSON input:
     {
         "id": 1,
@@ -158,16 +298,17 @@ def create_product():
     """
     product_data = request.get_json()
     try:
-        result = ProductSchema(**product_data)
-        product = result.model_dump()
+        with phase("validation"):
+            result = ProductSchema(**product_data)
+            product = result.model_dump()
     except ValidationError as e:
         return e.json(), 400
    
-    product["id"] = get_next_id(products)
-    products.append(product)
+    with phase("store"):
+        product = get_store().add(product)
     return product, 201
 
-@app.route("/products/<int:product_id>", methods=["PUT"])
+@bp.route("/products/<int:product_id>", methods=["PUT"])
 def update_product(product_id):
     """
     ---- G -----
@@ -175,46 +316,77 @@ def update_product(product_id):
     """
     product_data = request.get_json()
     try:
-        result = ProductSchema(**product_data)
-        updated_product_data = result.model_dump()
+        with phase("validation"):
+            result = ProductSchema(**product_data)
+            updated_product_data = result.model_dump()
     except ValidationError as e:
         return e.json(), 400
     
-    product = find_product_by_id(product_id)
+    with phase("store"):
+        product = get_store().update(product_id, updated_product_data)
     if product:
-        product.update(updated_product_data)
         return product, 200
     
     return {"error": "Product not found"}, 404
 
-@app.route("/products/<int:product_id>", methods=["DELETE"])
+@bp.route("/products/<int:product_id>", methods=["DELETE"])
 def delete_product(product_id):
     """
     ---- G -----
     Deletes a product based on a id
     """
-    for index, product in enumerate(products.copy()):
-        if product["id"] == product_id:
-            products.pop(index)
-            return {}, 204
+    with phase("store"):
+        deleted = get_store().delete(product_id)
+    if deleted:
+        return {}, 204
     return {"error": "Product not found"}, 404
 
 
-@app.route("/products/search", methods=["GET"])
+@bp.route("/products/changes", methods=["GET"])
+def product_changes():
+    """
+    Returns the products created or changed after the catalog version in the since query
+    parameter, and the ids of the deleted products (tombstones).
+    Mirrors keep the returned version and pass it as since on the next call.
+    limit caps the number of changes, "more" is true if there are more after the returned version.
+    If since is from before the last reset, "reset" is true and all products are returned, limit
+    at a time: "after" is the last id of the page, passed back with the same since for the next one.
+    """
+    since = request.args.get("since", 0, type=int)
+    limit = request.args.get("limit", type=int)
+    after = request.args.get("after", type=int)
+    if since < 0 or (limit is not None and limit < 1) or (after is not None and after < 0):
+        return {"error": "since, limit and after have to be positive numbers"}, 400
+
+    with phase("store"):
+        changes = get_store().changes_since(since, limit, after)
+    return changes, 200
+
+
+@bp.route("/products/search", methods=["GET"])
 def search_products():
     """
     ---- G -----
-    Returns a list of all products which includes the search_query in the name
+    Returns the products whose name or description contains every word of the search_query,
+    best match first (BM25 ranking, words in the name count more).
+    The last word also matches longer words (autocomplete) and words with a typo still match.
+    limit is the max number of products returned (default 50, max 1000), fuzzy=false turns off the typo matching
+    Responses are cached until the catalog changes
     """
     search_query = request.args.get("search_query")
-    found_products = []
-    for product in products:
-        if search_query.lower() in product["name"].lower():
-            found_products.append(product)
-    return found_products, 200
+    limit = request.args.get("limit", 50, type=int)
+    fuzzy = request.args.get("fuzzy", "true").lower() != "false"
+    if not search_query:
+        return {"error": "A search_query parameter is required"}, 400
+    if not 1 <= limit <= 1000:
+        return {"error": "limit has to be between 1 and 1000"}, 400
+
+    # Queries that only differ in case, spacing or punctuation share a cache entry
+    key = ("search", tuple(tokenize(search_query)), limit, fuzzy)
+    return cached_query(key, lambda: get_store().search(search_query, limit, fuzzy))
 
 
-@app.route("/products/stock_update/<int:product_id>", methods=["PUT"])
+@bp.route("/products/stock_update/<int:product_id>", methods=["PUT"])
 def product_stock_update(product_id):
     """
     --- VG ----
@@ -226,21 +398,22 @@ def product_stock_update(product_id):
     if quantity_update is None or quantity_update < 0:
         return {"error": "A valid quantity parameter is required"}, 400
 
-    product = find_product_by_id(product_id)
+    with phase("store"):
+        product = get_store().set_stock(product_id, quantity_update)
     if product:
-        # Ensure the stock quantity does not go negative
-        product["stock"] = quantity_update
         return product, 200
 
     return {"error": "Product not found"}, 404
 
 
-@app.route("/products/bulk", methods=["POST"])
+@bp.route("/products/bulk", methods=["POST"])
+@idempotent
 def create_product_bulk():
     """
     --- VG ----
     This endpoint receives a list of products and creates them.
     It uses a separate BulkCreateSchema, which only contains a list of products
+    Retries with the same Idempotency-Key header get the first response back
     Example input:
     {
         "products": [
@@ -262,21 +435,21 @@ def create_product_bulk():
     """
     try:
         bulk_data = request.get_json()
-        result = BulkProductSchema(**bulk_data)
-        result = result.model_dump()["products"]
+        with phase("validation"):
+            result = BulkProductSchema(**bulk_data)
+            result = result.model_dump()["products"]
     except ValidationError as e:
         return e.json(), 400
 
     added_products = []
-    for product in result:
-        product["id"] = get_next_id(products)
-        products.append(product)
-        added_products.append(product)
+    with phase("store"):
+        for product in result:
+            added_products.append(get_store().add(product))
 
     return added_products, 201
 
 
-@app.route("/products/bulk_update", methods=["PUT"])
+@bp.route("/products/bulk_update", methods=["PUT"])
 def update_product_bulk():
     """
     --- VG ----
@@ -347,18 +520,22 @@ def update_product_bulk():
 
     try:
         updated_products_data = request.get_json()
-        BulkProductSchema(**updated_products_data)
+        with phase("validation"):
+            BulkProductSchema(**updated_products_data)
     except ValidationError as e:
         return e.json(), 400    
     
     updated_products = []
-    for product in updated_products_data["products"]:
-        product_id = product["id"]
-        existing_product = find_product_by_id(product_id) 
-        if not existing_product:
-            continue  
-        existing_product.update(product)
-        updated_products.append(existing_product)
+    with phase("store"):
+        for product in updated_products_data["products"]:
+            product_id = product.get("id")
+            # An id like "1" or null matches no product, it is skipped like an unknown id
+            if type(product_id) is not int:
+                continue
+            existing_product = get_store().update(product_id, product)
+            if not existing_product:
+                continue  
+            updated_products.append(existing_product)
 
     return updated_products, 200
 
@@ -459,4 +636,7 @@ def update_product_bulk():
 #     if validation_errors:
 #         return validation_errors, 400
 
-#     return updated_products, 200
\ No newline at end of file
+#     return updated_products, 200
+
+
+app = create_app()
@@ -0,0 +1,188 @@
+"""
+Microbenchmarks for every route of the products API.
+
+The app is driven in-process with the Flask test client against synthetic catalogs,
+so no server is needed. Example:
+
+    python benchmark.py --sizes 1000,100000 --output benchmark_results.json
+    python benchmark.py --baseline benchmark_baseline.json
+
+With --baseline the run fails (exit code 1) if a route got slower than the threshold.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+from app import create_app
+from seed import generate_products
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+BULK_SIZE = 100
+# The query cache would answer repeated listings and searches without computing them,
+# so it is off to measure the routes themselves
+APP_CONFIG = {"SLOW_REQUEST_THRESHOLD": None, "QUERY_CACHE_SIZE": 0, "QUERY_COALESCING": False}
+
+
+def product_payload(name="Bench product"):
+    return {
+        "name": name,
+        "price": 20.0,
+        "category": "Electronics",
+        "specification": {"color": "white", "weight": 30.5, "height": 8.0, "length": 5.0},
+        "stock": 5,
+    }
+
+
+def route_calls(size):
+    """
+    Returns (name, function) pairs, each function makes one request with the test client.
+    The delete call takes the iteration number so every call removes a different product,
+    it can run at most size times (see run).
+    """
+    middle = max(size // 2, 1)
+    bulk_create = {"products": [product_payload(f"Bulk product {i}") for i in range(BULK_SIZE)]}
+    batch = {"ids": list(range(middle, middle + 20))}
+    bulk_update = {"products": [dict(product_payload(f"Updated {i}"), id=i) for i in range(1, min(BULK_SIZE, size) + 1)]}
+    return [
+        ("list", lambda client, i: client.get("/products")),
+        ("list_filtered", lambda client, i: client.get("/products?max_price=40")),
+        ("detail", lambda client, i: client.get(f"/products/{middle}")),
+        ("batch", lambda client, i: client.post("/products/batch", json=batch)),
+        ("search", lambda client, i: client.get("/products/search?search_query=gaming")),
+        ("create", lambda client, i: client.post("/products", json=product_payload())),
+        ("bulk_create", lambda client, i: client.post("/products/bulk", json=bulk_create)),
+        ("update", lambda client, i: client.put(f"/products/{middle}", json=product_payload("Updated"))),
+        ("bulk_update", lambda client, i: client.put("/products/bulk_update", json=bulk_update)),
+        ("stock_update", lambda client, i: client.put(f"/products/stock_update/{middle}?quantity=7")),
+        ("delete", lambda client, i: client.delete(f"/products/{size - i}")),
+    ]
+
+
+def percentile(sorted_values, fraction):
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "iterations": len(latencies),
+        "ops_per_sec": len(latencies) / total if total else 0.0,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p90_ms": percentile(latencies, 0.90) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+def run_route(client, call, max_iterations, time_budget):
+    """
+    Runs call until max_iterations or time_budget seconds is reached, at least once
+    """
+    latencies = []
+    started = time.perf_counter()
+    for i in range(max_iterations):
+        before = time.perf_counter()
+        response = call(client, i)
+        latencies.append(time.perf_counter() - before)
+        if response.status_code >= 400:
+            raise RuntimeError(f"benchmark request failed with {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        if time.perf_counter() - started > time_budget:
+            break
+    return summarize(latencies)
+
+
+def run(sizes=DEFAULT_SIZES, max_iterations=200, time_budget=2.0, routes=None, seed=0, log=print):
+    """
+    Runs the benchmarks and returns the results as a dict
+    """
+    results = {}
+    for size in sizes:
+        results[str(size)] = {}
+        catalog = generate_products(size, seed)
+        for name, call in route_calls(size):
+            if routes and name not in routes:
+                continue
+            # Every route gets a fresh app so writes from earlier routes don't leak in
+            client = create_app(APP_CONFIG, products=catalog).test_client()
+            # Every delete removes another product, a small catalog runs out of them
+            iterations = min(max_iterations, size) if name == "delete" else max_iterations
+            stats = run_route(client, call, iterations, time_budget)
+            results[str(size)][name] = stats
+            log(f"{size:>9} {name:<14} {stats['ops_per_sec']:>10.1f} ops/s  "
+                f"p50 {stats['p50_ms']:8.3f}ms  p99 {stats['p99_ms']:8.3f}ms  n={stats['iterations']}")
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "max_iterations": max_iterations,
+            "time_budget": time_budget,
+        },
+        "results": results,
+    }
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    Returns a list of regressions, a route regressed if its p50 latency grew more than threshold
+    """
+    regressions = []
+    for size, routes in results["results"].items():
+        for name, stats in routes.items():
+            old = baseline["results"].get(size, {}).get(name)
+            if not old or not old["p50_ms"]:
+                continue
+            change = stats["p50_ms"] / old["p50_ms"] - 1
+            if change > threshold:
+                regressions.append({
+                    "size": size,
+                    "route": name,
+                    "baseline_p50_ms": old["p50_ms"],
+                    "p50_ms": stats["p50_ms"],
+                    "change": change,
+                })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every route of the products API")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="comma separated catalog sizes")
+    parser.add_argument("--routes", default=None, help="comma separated route names, all by default")
+    parser.add_argument("--iterations", type=int, default=200, help="max iterations per route")
+    parser.add_argument("--time-budget", type=float, default=2.0, help="max seconds per route")
+    parser.add_argument("--output", default="benchmark_results.json", help="where the results are written")
+    parser.add_argument("--baseline", default=None, help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p50 slowdown, 0.2 is 20%%")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    routes = args.routes.split(",") if args.routes else None
+    results = run(sizes, args.iterations, args.time_budget, routes)
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['size']} {regression['route']}: "
+                  f"p50 {regression['baseline_p50_ms']:.3f}ms -> {regression['p50_ms']:.3f}ms "
+                  f"(+{regression['change'] * 100:.0f}%)")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""
+Catalog export and import as CSV or NDJSON (one JSON product per line).
+
+In CSV the specification is flattened into specification.<field> columns and a missing
+description is an empty cell. Both directions stream, so the memory used does not grow with
+the size of the catalog.
+"""
+import csv
+import io
+import json
+import time
+from itertools import islice
+
+from flask import Response, current_app, request, stream_with_context
+from pydantic import TypeAdapter, ValidationError
+
+from schemas import ProductSchema, Specification
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+SPECIFICATION_COLUMNS = [f"specification.{field}" for field in Specification.model_fields]
+CSV_COLUMNS = ["id", "name", "description", "price", "category", "stock", *SPECIFICATION_COLUMNS]
+
+product_list = TypeAdapter(list[ProductSchema])
+
+
+def to_row(product):
+    """
+    Flattens a product into a CSV row
+    """
+    row = [product.get(column) for column in CSV_COLUMNS[:6]]
+    specification = product.get("specification") or {}
+    row.extend(specification.get(column.split(".", 1)[1]) for column in SPECIFICATION_COLUMNS)
+    return ["" if value is None else value for value in row]
+
+
+def from_row(row):
+    """
+    Turns a CSV row (a dict by column) back into the product JSON, the values are still strings
+    and are converted by the schema
+    """
+    product = {}
+    specification = {}
+    for column, value in row.items():
+        if column is None or value in (None, ""):
+            continue
+        if column.startswith("specification."):
+            specification[column.split(".", 1)[1]] = value
+        else:
+            product[column] = value
+    if specification:
+        product["specification"] = specification
+    return product
+
+
+def export_csv(products, rows_per_chunk):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    while True:
+        chunk = list(islice(products, rows_per_chunk))
+        if not chunk:
+            break
+        writer.writerows(to_row(product) for product in chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_ndjson(products, rows_per_chunk):
+    dumps = current_app.json.dumps
+    while True:
+        chunk = list(islice(products, rows_per_chunk))
+        if not chunk:
+            break
+        yield "".join(dumps(product) + "\n" for product in chunk)
+
+
+def read_rows(stream, file_format):
+    """
+    Yields (row number, product JSON or None, error message) for every row of the upload
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="" if file_format == "csv" else None)
+    if file_format == "csv":
+        for number, row in enumerate(csv.DictReader(text), 1):
+            yield number, from_row(row), None
+        return
+    number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            product = json.loads(line)
+        except ValueError:
+            yield number, None, "Invalid JSON"
+            continue
+        if not isinstance(product, dict):
+            yield number, None, "A row has to be a JSON object"
+            continue
+        yield number, product, None
+
+
+class ImportReport:
+    """
+    Counts the imported rows and keeps the first max_errors row errors
+    """
+
+    def __init__(self, max_errors):
+        self.max_errors = max_errors
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, number, product_id, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": number, "id": product_id, "errors": errors})
+
+    def result(self):
+        seconds = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "failed": self.failed,
+            "seconds": round(seconds, 6),
+            "rows_per_second": round(self.rows / seconds, 1) if seconds else None,
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def parse_id(value):
+    """
+    Returns the id of a row as an int, None if the row has no id, or raises ValueError
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError
+    product_id = int(value)
+    if product_id < 1 or (isinstance(value, float) and value != product_id):
+        raise ValueError
+    return product_id
+
+
+def import_batch(store, batch, report):
+    """
+    Validates a batch of (row number, id, product JSON) with one schema call and upserts the valid rows.
+    Rows that fail are reported and the rest of the batch is validated again without them.
+    """
+    try:
+        products = product_list.validate_python([product for number, product_id, product in batch])
+    except ValidationError as e:
+        failed = {}
+        for error in e.errors(include_url=False, include_context=False):
+            index, *loc = error["loc"]
+            failed.setdefault(index, []).append({"loc": loc, "msg": error["msg"], "type": error["type"]})
+        for index, errors in failed.items():
+            number, product_id, product = batch[index]
+            report.error(number, product_id, errors)
+        batch = [row for index, row in enumerate(batch) if index not in failed]
+        products = product_list.validate_python([product for number, product_id, product in batch])
+
+    for (number, product_id, data), product in zip(batch, products):
+        product = product.model_dump()
+        if product_id is not None and store.update(product_id, product) is not None:
+            report.updated += 1
+        else:
+            store.add(product, product_id)
+            report.created += 1
+
+
+def init_catalog_io(app, store):
+    """
+    Adds the /products/export and /products/import endpoints.
+
+    Config:
+    EXPORT_CHUNK_ROWS - products serialized per streamed chunk
+    IMPORT_BATCH_SIZE - rows validated and stored together
+    IMPORT_MAX_ERRORS - row errors listed in the import report, the rest are only counted
+    """
+    app.config.setdefault("EXPORT_CHUNK_ROWS", 500)
+    app.config.setdefault("IMPORT_BATCH_SIZE", 500)
+    app.config.setdefault("IMPORT_MAX_ERRORS", 1000)
+
+    def requested_format():
+        file_format = request.args.get("format")
+        if file_format is None:
+            file_format = "csv" if request.mimetype == FORMATS["csv"] else "ndjson"
+        return file_format if file_format in FORMATS else None
+
+    @app.get("/products/export")
+    def export_products():
+        """
+        Streams the whole catalog in id order, format=csv (default) or format=ndjson.
+        With a local store the products are read from a snapshot taken when the export starts, a
+        shared store (or remote shards) is paged through by id, so later changes may be seen.
+        """
+        file_format = request.args.get("format", "csv")
+        if file_format not in FORMATS:
+            return {"error": f"format has to be one of {', '.join(FORMATS)}"}, 400
+
+        export = export_csv if file_format == "csv" else export_ndjson
+        rows = export(store.iter_all(), current_app.config["EXPORT_CHUNK_ROWS"])
+        return Response(
+            stream_with_context(rows),
+            mimetype=FORMATS[file_format],
+            headers={"Content-Disposition": f"attachment; filename=products.{file_format}"},
+        )
+
+    @app.post("/products/import")
+    def import_products():
+        """
+        Creates or updates products from a CSV or NDJSON upload (the format query parameter or
+        the Content-Type, text/csv or application/x-ndjson).
+        A row with the id of an existing product replaces it, other rows are created, with their
+        id if they have one. Invalid rows are skipped and listed in the report with their row number.
+        """
+        file_format = requested_format()
+        if file_format is None:
+            return {"error": f"format has to be one of {', '.join(FORMATS)}"}, 400
+
+        config = current_app.config
+        report = ImportReport(config["IMPORT_MAX_ERRORS"])
+        batch = []
+        try:
+            for number, product, error in read_rows(request.stream, file_format):
+                report.rows += 1
+                if error is not None:
+                    report.error(number, None, [{"loc": [], "msg": error, "type": "invalid_row"}])
+                    continue
+                try:
+                    product_id = parse_id(product.pop("id", None))
+                except (TypeError, ValueError):
+                    report.error(number, None, [{"loc": ["id"], "msg": "id has to be a positive integer", "type": "invalid_id"}])
+                    continue
+                batch.append((number, product_id, product))
+                if len(batch) >= config["IMPORT_BATCH_SIZE"]:
+                    import_batch(store, batch, report)
+                    batch = []
+        except (UnicodeDecodeError, csv.Error) as e:
+            return {"error": f"Could not read the upload: {e}", **report.result()}, 400
+        if batch:
+            import_batch(store, batch, report)
+        return report.result(), 200
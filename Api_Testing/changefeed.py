@@ -0,0 +1,108 @@
+import json
+import threading
+from collections import deque
+from itertools import islice
+
+from flask import Response, current_app, request, stream_with_context
+
+
+class ChangeFeed:
+    """
+    The last max_events product changes in a ring buffer.
+    Every event gets the next event id, readers pass the last id they saw and get the
+    events after it. A reader that fell behind the buffer gets a "resync" event and has
+    to fetch the catalog again.
+    """
+
+    def __init__(self, max_events=10_000):
+        self.events = deque(maxlen=max_events)
+        self.last_id = 0
+        self.condition = threading.Condition()
+
+    def publish(self, kind, product_id, version, fields):
+        with self.condition:
+            self.last_id += 1
+            self.events.append({
+                "event_id": self.last_id,
+                "type": kind,
+                "id": product_id,
+                "version": version,
+                "fields": fields,
+            })
+            self.condition.notify_all()
+
+    def events_after(self, last_id, timeout=None):
+        """
+        Returns the events after last_id, waits up to timeout seconds if there are none yet.
+        Returns None if events after last_id were already dropped from the buffer, or if last_id
+        is from after the last event (the feed was restarted), the reader has to resync.
+        """
+        with self.condition:
+            if last_id > self.last_id:
+                return None
+            if last_id == self.last_id and timeout:
+                self.condition.wait_for(lambda: self.last_id > last_id, timeout)
+            if not self.events or last_id >= self.last_id:
+                return []
+            first_id = self.events[0]["event_id"]
+            if last_id < first_id - 1:
+                return None
+            return list(islice(self.events, last_id - first_id + 1, None))
+
+
+def format_event(event):
+    return f"id: {event['event_id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def init_changefeed(app, store):
+    """
+    Publishes every change of the store to a ChangeFeed and adds the /products/events endpoint.
+    A store that has its own feed (the shared store) is streamed from that feed instead, so all
+    workers use the same event ids.
+
+    Config:
+    CHANGEFEED_MAX_EVENTS - how many events are kept for readers that reconnect
+    CHANGEFEED_HEARTBEAT - seconds between keep alive comments on an idle stream
+    """
+    app.config.setdefault("CHANGEFEED_MAX_EVENTS", 10_000)
+    app.config.setdefault("CHANGEFEED_HEARTBEAT", 15)
+    feed = getattr(store, "feed", None)
+    if feed is None:
+        feed = ChangeFeed(app.config["CHANGEFEED_MAX_EVENTS"])
+        store.listeners.append(feed.publish)
+    app.extensions["changefeed"] = feed
+
+    @app.get("/products/events")
+    def product_events():
+        """
+        Streams product changes as Server-Sent Events.
+        Readers resume with the Last-Event-ID header (or the last_event_id query parameter),
+        without it the stream starts with the next change.
+        """
+        last_id = request.headers.get("Last-Event-ID", request.args.get("last_event_id"))
+        last_id = int(last_id) if last_id and last_id.isdigit() else feed.last_id
+        heartbeat = current_app.config["CHANGEFEED_HEARTBEAT"]
+
+        def stream():
+            position = last_id
+            yield "retry: 1000\n\n"
+            while True:
+                events = feed.events_after(position, timeout=heartbeat)
+                if events is None:
+                    position = feed.last_id
+                    yield f"id: {position}\nevent: resync\ndata: {{}}\n\n"
+                    continue
+                if not events:
+                    yield ": keep-alive\n\n"
+                    continue
+                for event in events:
+                    yield format_event(event)
+                position = events[-1]["event_id"]
+
+        return Response(
+            stream_with_context(stream()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    return feed
@@ -0,0 +1,16 @@
+import pytest
+
+from app import create_app
+
+
+@pytest.fixture()
+def app():
+    """
+    A new app with its own products for every test, so tests can run in parallel
+    """
+    return create_app({"TESTING": True})
+
+
+@pytest.fixture()
+def client(app):
+    return app.test_client()
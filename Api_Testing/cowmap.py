@@ -0,0 +1,106 @@
+PAGE_SIZE = 1024
+
+
+class CowMap:
+    """
+    A dict split into pages of PAGE_SIZE ids, that can be copied in (almost) constant time.
+    A copy shares all pages with the original, a page is only copied the first time one
+    of them writes to it (copy on write), so copying a map of 1M products copies ~1000
+    page references instead of 1M entries.
+    Pages are kept sorted and so are the ids in a page, so the values come out in id order.
+    Ids that only grow are appended, a smaller id re-sorts its page (at most page_size entries).
+    """
+
+    def __init__(self, items=(), page_size=PAGE_SIZE):
+        self.page_size = page_size
+        self._pages = {}
+        self._owned = set()
+        self._len = 0
+        for key, value in items:
+            self[key] = value
+
+    def copy(self):
+        """
+        Returns a copy sharing every page, neither map owns a page after this
+        """
+        other = CowMap(page_size=self.page_size)
+        other._pages = dict(self._pages)
+        other._len = self._len
+        self._owned = set()
+        return other
+
+    def _page_for_write(self, key):
+        number = key // self.page_size
+        page = self._pages.get(number)
+        if page is None:
+            page = {}
+            unsorted = self._pages and number < next(reversed(self._pages))
+            self._pages[number] = page
+            if unsorted:
+                self._pages = dict(sorted(self._pages.items()))
+        elif number not in self._owned:
+            page = dict(page)
+            self._pages[number] = page
+        self._owned.add(number)
+        return page
+
+    def __len__(self):
+        return self._len
+
+    def __contains__(self, key):
+        page = self._pages.get(key // self.page_size)
+        return page is not None and key in page
+
+    def get(self, key, default=None):
+        page = self._pages.get(key // self.page_size)
+        if page is None:
+            return default
+        return page.get(key, default)
+
+    def __setitem__(self, key, value):
+        page = self._page_for_write(key)
+        if key in page:
+            page[key] = value
+            return
+        self._len += 1
+        unsorted = page and key < next(reversed(page))
+        page[key] = value
+        if unsorted:
+            items = sorted(page.items())
+            page.clear()
+            page.update(items)
+
+    def pop(self, key, default=None):
+        if key not in self:
+            return default
+        self._len -= 1
+        return self._page_for_write(key).pop(key)
+
+    def values(self):
+        for page in self._pages.values():
+            yield from page.values()
+
+    def items(self):
+        for page in self._pages.values():
+            yield from page.items()
+
+    def values_after(self, key):
+        """
+        The values of the keys greater than key, in key order
+        """
+        first = key // self.page_size
+        for number, page in self._pages.items():
+            if number < first:
+                continue
+            if number > first:
+                yield from page.values()
+                continue
+            for page_key, value in page.items():
+                if page_key > key:
+                    yield value
+
+    def max_key(self):
+        for page in reversed(self._pages.values()):
+            if page:
+                return max(page)
+        return None
@@ -0,0 +1,121 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+
+from admission import client_id
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+class IdempotencyEntry:
+    """
+    One request made with an idempotency key.
+    done is set when the first request finished, response is None if it failed and should not be replayed.
+    """
+
+    def __init__(self, fingerprint, expires):
+        self.fingerprint = fingerprint
+        self.expires = expires
+        self.done = threading.Event()
+        self.response = None
+
+
+class IdempotencyCache:
+    """
+    A LRU cache of responses by idempotency key, entries also expire after ttl seconds
+    """
+
+    def __init__(self, max_keys=10_000, ttl=24 * 60 * 60):
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def begin(self, key, fingerprint):
+        """
+        Returns (entry, True) if this request should run, or (entry, False) if a request
+        with the same key already ran or is running
+        """
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (entry.expires < now or (entry.done.is_set() and entry.response is None)):
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry, False
+
+            entry = self.entries[key] = IdempotencyEntry(fingerprint, now + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_keys:
+                self.entries.popitem(last=False)
+            return entry, True
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def init_idempotency(app):
+    """
+    Sets up the idempotency cache for the routes marked with @idempotent.
+
+    Config:
+    IDEMPOTENCY_MAX_KEYS - max number of stored responses
+    IDEMPOTENCY_TTL - seconds a stored response is kept
+    IDEMPOTENCY_WAIT - seconds a retry waits for the first request with the same key to finish
+    """
+    app.config.setdefault("IDEMPOTENCY_MAX_KEYS", 10_000)
+    app.config.setdefault("IDEMPOTENCY_TTL", 24 * 60 * 60)
+    app.config.setdefault("IDEMPOTENCY_WAIT", 30)
+    cache = IdempotencyCache(app.config["IDEMPOTENCY_MAX_KEYS"], app.config["IDEMPOTENCY_TTL"])
+    app.extensions["idempotency"] = cache
+    return cache
+
+
+def replay(entry):
+    status, body, headers = entry.response
+    response = current_app.response_class(body, status, headers)
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(view):
+    """
+    Makes a route answer retries with the same Idempotency-Key header from the cache.
+    The key is scoped to the client and the route, and a retry must send the same body.
+    A retry that arrives while the first request still runs waits for it to finish.
+    Responses with a 5xx status are not stored, so they can be retried.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view(*args, **kwargs)
+
+        cache = current_app.extensions["idempotency"]
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        entry, first = cache.begin((client_id(), request.method, request.path, key), fingerprint)
+
+        if not first:
+            if entry.fingerprint != fingerprint:
+                return {"error": "Idempotency-Key was already used with a different request"}, 422
+            if not entry.done.wait(current_app.config["IDEMPOTENCY_WAIT"]):
+                return {"error": "A request with this Idempotency-Key is still running"}, 409
+            if entry.response is None:
+                return {"error": "The request with this Idempotency-Key failed, retry it"}, 409
+            return replay(entry)
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code < 500:
+                entry.response = (response.status_code, response.get_data(), {"Content-Type": response.content_type})
+            return response
+        finally:
+            entry.done.set()
+
+    return wrapper
@@ -0,0 +1,258 @@
+"""
+Concurrent load generator for the products API.
+
+Starts the app locally (or uses --url), drives a weighted mix of the endpoints from many
+concurrent connections and reports throughput, error rate and p50/p95/p99 latency per route.
+The request payloads are the ones used by test_products.py. Example:
+
+    python loadtest.py --concurrency 32 --duration 30
+    python loadtest.py --mix detail=80,list=5,search=10,create=5 --json loadtest_results.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from test_products import BULK_NEW_PRODUCTS, BULK_UPDATED_PRODUCTS, NEW_PRODUCT, UPDATED_PRODUCT
+
+DEFAULT_MIX = {
+    "status": 2,
+    "list": 5,
+    "list_filtered": 10,
+    "detail": 45,
+    "search": 15,
+    "create": 8,
+    "update": 5,
+    "stock_update": 5,
+    "bulk_create": 1,
+    "bulk_update": 1,
+    "delete": 3,
+}
+
+
+class LoadState:
+    """
+    Ids that the operations pick from, shared between all the worker threads
+    """
+
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        self.created_ids = deque()
+        self.lock = threading.Lock()
+
+    def random_id(self, rng):
+        return rng.choice(self.product_ids)
+
+    def remember(self, product_ids):
+        with self.lock:
+            self.created_ids.extend(product_ids)
+
+    def take_created(self):
+        with self.lock:
+            return self.created_ids.popleft() if self.created_ids else None
+
+
+def make_operations(base_url):
+    """
+    Returns a dict of route name -> function(session, state, rng) that makes one request.
+    Only products created during the run are deleted, so the seed catalog stays intact.
+    An operation that ends up calling another route returns (route name, response) instead,
+    so the sample is counted for the route that was hit.
+    """
+
+    def create(session, state, rng):
+        response = session.post(f"{base_url}/products", json=NEW_PRODUCT)
+        if response.status_code == 201:
+            state.remember([response.json()["id"]])
+        return response
+
+    def bulk_create(session, state, rng):
+        response = session.post(f"{base_url}/products/bulk", json=BULK_NEW_PRODUCTS)
+        if response.status_code == 201:
+            state.remember([product["id"] for product in response.json()])
+        return response
+
+    def delete(session, state, rng):
+        product_id = state.take_created()
+        if product_id is None:
+            # Nothing to delete yet, create a product so a later delete has one
+            return "create", create(session, state, rng)
+        return session.delete(f"{base_url}/products/{product_id}")
+
+    return {
+        "status": lambda session, state, rng: session.get(base_url),
+        "list": lambda session, state, rng: session.get(f"{base_url}/products"),
+        "list_filtered": lambda session, state, rng: session.get(f"{base_url}/products?max_price=40"),
+        "detail": lambda session, state, rng: session.get(f"{base_url}/products/{state.random_id(rng)}"),
+        "search": lambda session, state, rng: session.get(f"{base_url}/products/search?search_query=laptop"),
+        "create": create,
+        "update": lambda session, state, rng: session.put(
+            f"{base_url}/products/{state.random_id(rng)}", json=UPDATED_PRODUCT),
+        "stock_update": lambda session, state, rng: session.put(
+            f"{base_url}/products/stock_update/{state.random_id(rng)}?quantity={rng.randint(0, 100)}"),
+        "bulk_create": bulk_create,
+        "bulk_update": lambda session, state, rng: session.put(
+            f"{base_url}/products/bulk_update", json=BULK_UPDATED_PRODUCTS),
+        "delete": delete,
+    }
+
+
+def parse_mix(text):
+    """
+    Parses "detail=80,list=20" into {"detail": 80, "list": 20}
+    """
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, fraction):
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    """
+    samples is a list of (route, latency, ok), returns per route and total stats
+    """
+    by_route = {}
+    for route, latency, ok in samples:
+        by_route.setdefault(route, []).append((latency, ok))
+    by_route["total"] = [(latency, ok) for route, latency, ok in samples]
+
+    report = {}
+    for route, values in by_route.items():
+        if not values:
+            continue
+        latencies = sorted(latency for latency, ok in values)
+        errors = sum(1 for latency, ok in values if not ok)
+        report[route] = {
+            "requests": len(values),
+            "errors": errors,
+            "error_rate": errors / len(values),
+            "throughput": len(values) / elapsed,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+        }
+    return report
+
+
+def run_load(base_url, mix, concurrency=16, duration=10.0, max_requests=None, seed=0):
+    """
+    Drives the mix against base_url from concurrency threads, each with its own keep-alive session.
+    Stops after duration seconds or max_requests requests, whichever comes first.
+    """
+    operations = make_operations(base_url)
+    unknown = set(mix) - set(operations)
+    if unknown:
+        raise ValueError(f"Unknown routes in mix: {', '.join(sorted(unknown))}")
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    product_ids = [product["id"] for product in requests.get(f"{base_url}/products").json()] or [1]
+    state = LoadState(product_ids)
+    samples = []
+    samples_lock = threading.Lock()
+    issued = iter(range(max_requests)) if max_requests else None
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        local = []
+        with requests.Session() as session:
+            while time.perf_counter() < deadline:
+                if issued is not None and next(issued, None) is None:
+                    break
+                name = rng.choices(names, weights)[0]
+                route = name
+                started = time.perf_counter()
+                try:
+                    response = operations[name](session, state, rng)
+                    if isinstance(response, tuple):
+                        route, response = response
+                    ok = response.status_code < 400
+                except requests.RequestException:
+                    ok = False
+                local.append((route, time.perf_counter() - started, ok))
+        with samples_lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    return summarize(samples, time.perf_counter() - started)
+
+
+def start_server(port):
+    """
+    Starts the app with flask run in a separate process and waits until it answers
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "flask", "--app", "app", "run", "--port", str(port), "--with-threads"],
+        cwd=directory,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            requests.get(base_url, timeout=0.5)
+            return process, base_url
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("The app did not start")
+
+
+def print_report(report):
+    print(f"{'route':<14} {'requests':>9} {'req/s':>9} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, stats in sorted(report.items(), key=lambda item: item[0] == "total"):
+        print(f"{route:<14} {stats['requests']:>9} {stats['throughput']:>9.1f} {stats['error_rate']:>6.1%} "
+              f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load test for the products API")
+    parser.add_argument("--url", default=None, help="use a running server instead of starting one")
+    parser.add_argument("--port", type=int, default=5055, help="port for the started server")
+    parser.add_argument("--concurrency", type=int, default=16, help="number of concurrent connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--requests", type=int, default=None, help="stop after this many requests")
+    parser.add_argument("--mix", default=None, help="weighted routes, e.g. detail=80,list=20")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    process = None
+    base_url = args.url
+    if base_url is None:
+        process, base_url = start_server(args.port)
+    try:
+        mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+        report = run_load(base_url, mix, args.concurrency, args.duration, args.requests, args.seed)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, request
+
+# Upper bounds of the histogram buckets, "+Inf" is added when rendering
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+slow_log = logging.getLogger("api.slow_requests")
+
+
+class Histogram:
+    """
+    A cumulative histogram in the Prometheus style.
+    Only the per bucket counts are stored, the cumulative values are built when rendering.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """
+    Keeps latency, size and status code counters per route.
+    Routes are keyed by their url rule (e.g. /products/<int:product_id>) so the
+    number of series stays small no matter how many ids are requested.
+    collectors are functions returning more lines to render, e.g. cache counters.
+    """
+
+    def __init__(self, store_size):
+        self.store_size = store_size
+        self.collectors = []
+        self.lock = threading.Lock()
+        self.latency = {}
+        self.request_size = {}
+        self.response_size = {}
+        self.statuses = {}
+
+    def observe(self, method, route, status, duration, request_size, response_size):
+        key = (method, route)
+        with self.lock:
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.request_size[key] = Histogram(SIZE_BUCKETS)
+                self.response_size[key] = Histogram(SIZE_BUCKETS)
+            self.latency[key].observe(duration)
+            self.request_size[key].observe(request_size)
+            if response_size is not None:
+                self.response_size[key].observe(response_size)
+            status_key = (method, route, status)
+            self.statuses[status_key] = self.statuses.get(status_key, 0) + 1
+
+    def render(self):
+        """
+        Returns all metrics in the Prometheus text format
+        """
+        histograms = [
+            ("api_request_duration_seconds", "Request latency in seconds by route.", self.latency),
+            ("api_request_size_bytes", "Request body size in bytes by route.", self.request_size),
+            ("api_response_size_bytes", "Response body size in bytes by route.", self.response_size),
+        ]
+        lines = []
+        with self.lock:
+            for name, description, series in histograms:
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} histogram")
+                for (method, route), histogram in sorted(series.items()):
+                    labels = f'method="{_label(method)}",route="{_label(route)}"'
+                    lines.extend(histogram.render(name, labels))
+
+            lines.append("# HELP api_requests_total Responses by route and status code.")
+            lines.append("# TYPE api_requests_total counter")
+            for (method, route, status), count in sorted(self.statuses.items()):
+                lines.append(
+                    f'api_requests_total{{method="{_label(method)}",route="{_label(route)}",status="{status}"}} {count}'
+                )
+
+        lines.append("# HELP api_store_products Number of products in the store.")
+        lines.append("# TYPE api_store_products gauge")
+        lines.append(f"api_store_products {self.store_size()}")
+        for collector in self.collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+def init_metrics(app, store_size):
+    """
+    Registers the request hooks and the /metrics endpoint on the app.
+    store_size is a function returning the current number of products.
+
+    Config:
+    SLOW_REQUEST_THRESHOLD - requests slower than this many seconds are logged, None turns it off
+    """
+    app.config.setdefault("SLOW_REQUEST_THRESHOLD", 0.5)
+    metrics = Metrics(store_size)
+    app.extensions["metrics"] = metrics
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop("request_started", None)
+        if started is None:
+            return response
+        duration = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+
+        metrics.observe(
+            request.method,
+            route,
+            response.status_code,
+            duration,
+            request.content_length or 0,
+            # Streamed responses would be buffered to get their length, so they are not measured
+            None if response.is_streamed else response.calculate_content_length(),
+        )
+
+        threshold = app.config["SLOW_REQUEST_THRESHOLD"]
+        if threshold is not None and duration >= threshold:
+            slow_log.warning(
+                "slow request %s %s params=%s args=%s status=%s duration=%.4fs",
+                request.method,
+                route,
+                request.view_args or {},
+                request.args.to_dict(),
+                response.status_code,
+                duration,
+            )
+        return response
+
+    @app.get("/metrics")
+    def metrics_endpoint():
+        """
+        Returns the collected metrics in the Prometheus text format
+        """
+        return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+    return metrics
@@ -0,0 +1,62 @@
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class ProductJSONCache:
+    """
+    A LRU cache of products already serialized to JSON, by id.
+    It listens to the store and drops a product when it changes. A product serialized while
+    some product changed is not stored, the change may have been missed.
+    """
+
+    def __init__(self, store, max_products=100_000):
+        self.store = store
+        self.max_products = max_products
+        self.entries = OrderedDict()
+        self.changes = 0
+        self.lock = threading.Lock()
+        store.listeners.append(self.changed)
+
+    def changed(self, kind, product_id, version, fields):
+        with self.lock:
+            self.changes += 1
+            if kind == "reset":
+                self.entries.clear()
+            else:
+                self.entries.pop(product_id, None)
+
+    def get(self, product_id):
+        """
+        Returns the product as a JSON string, or None if there is no product with the id
+        """
+        with self.lock:
+            data = self.entries.get(product_id)
+            if data is not None:
+                self.entries.move_to_end(product_id)
+                return data
+            changes = self.changes
+
+        product = self.store.get(product_id)
+        if product is None:
+            return None
+        data = current_app.json.dumps(product)
+
+        with self.lock:
+            if self.changes == changes:
+                self.entries[product_id] = data
+                if len(self.entries) > self.max_products:
+                    self.entries.popitem(last=False)
+        return data
+
+
+def init_product_cache(app, store):
+    """
+    Config:
+    PRODUCT_JSON_CACHE_SIZE - max number of serialized products that are kept
+    """
+    app.config.setdefault("PRODUCT_JSON_CACHE_SIZE", 100_000)
+    cache = ProductJSONCache(store, app.config["PRODUCT_JSON_CACHE_SIZE"])
+    app.extensions["product_json"] = cache
+    return cache
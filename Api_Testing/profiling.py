@@ -0,0 +1,106 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+PROFILE_HEADER = "X-Profile"
+PHASES = ("json_parsing", "validation", "store", "serialization")
+
+profile_log = logging.getLogger("api.profile")
+
+
+@contextmanager
+def phase(name):
+    """
+    Adds the time spent inside the block to the named phase of the current request.
+    Does nothing unless the request is being profiled, so it is cheap to leave in the handlers.
+    """
+    phases = g.get("profile_phases") if has_request_context() else None
+    if phases is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = phases.get(name, 0.0) + time.perf_counter() - started
+
+
+class ProfilingJSONProvider(DefaultJSONProvider):
+    """
+    The normal Flask JSON provider, but parsing and serializing is timed as its own phase
+    """
+
+    def loads(self, s, **kwargs):
+        with phase("json_parsing"):
+            return super().loads(s, **kwargs)
+
+    def dumps(self, obj, **kwargs):
+        with phase("serialization"):
+            return super().dumps(obj, **kwargs)
+
+
+def _profile_path(directory, route):
+    name = route.strip("/").replace("/", "_").replace("<", "").replace(">", "").replace(":", "-") or "root"
+    return os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{time.perf_counter_ns()}-{request.method}-{name}")
+
+
+def init_profiling(app):
+    """
+    Registers the opt in profiling hooks on the app.
+    A request is profiled when PROFILING_ENABLED is set and the request has an X-Profile: 1 header.
+
+    Config:
+    PROFILING_ENABLED - turns the profiling hooks on
+    PROFILE_DIR - folder where the .prof files and their text summaries are written
+    PROFILE_TOP_N - number of functions in the summary
+    """
+    app.config.setdefault("PROFILING_ENABLED", False)
+    app.config.setdefault("PROFILE_DIR", "profiles")
+    app.config.setdefault("PROFILE_TOP_N", 20)
+    app.json = ProfilingJSONProvider(app)
+
+    @app.before_request
+    def start_profiler():
+        if not app.config["PROFILING_ENABLED"] or request.headers.get(PROFILE_HEADER) not in ("1", "true"):
+            return
+        g.profile_phases = {}
+        g.profile_started = time.perf_counter()
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+    @app.after_request
+    def stop_profiler(response):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        total = time.perf_counter() - g.pop("profile_started")
+        phases = g.pop("profile_phases")
+
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        directory = app.config["PROFILE_DIR"]
+        os.makedirs(directory, exist_ok=True)
+        path = _profile_path(directory, route)
+        profiler.dump_stats(path + ".prof")
+
+        summary = io.StringIO()
+        stats = pstats.Stats(profiler, stream=summary)
+        stats.sort_stats("cumulative").print_stats(app.config["PROFILE_TOP_N"])
+        breakdown = ", ".join(f"{name}={phases.get(name, 0.0) * 1000:.3f}ms" for name in PHASES)
+        with open(path + ".txt", "w") as file:
+            file.write(f"{request.method} {request.full_path} total={total * 1000:.3f}ms {breakdown}\n")
+            file.write(summary.getvalue())
+        profile_log.info("profiled %s %s total=%.3fms %s -> %s.prof", request.method, route, total * 1000, breakdown, path)
+
+        timings = [f"{name};dur={phases.get(name, 0.0) * 1000:.3f}" for name in PHASES]
+        timings.append(f"total;dur={total * 1000:.3f}")
+        response.headers["Server-Timing"] = ", ".join(timings)
+        response.headers["X-Profile-File"] = path + ".prof"
+        return response
@@ -0,0 +1,163 @@
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class Flight:
+    """
+    A query result that is being computed, identical requests wait for it instead of computing it again.
+    data is None if the computation failed.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.data = None
+
+
+class QueryCache:
+    """
+    A LRU cache of serialized query responses (listings and searches), keyed by the route and
+    its normalized query parameters.
+    Every entry remembers the catalog generation (the store version, every change bumps it) it
+    was computed at, an entry from an older generation is a miss. A result computed while the
+    catalog changed is not stored, it may mix the old and the new catalog.
+    Identical queries that miss at the same time are computed once (single flight): the first
+    one computes the result and the others wait up to coalesce_wait seconds for it.
+    """
+
+    def __init__(self, store, max_entries=256, max_bytes=64 * 1024 * 1024, coalesce=True, coalesce_wait=30):
+        self.store = store
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.coalesce = coalesce
+        self.coalesce_wait = coalesce_wait
+        self.entries = OrderedDict()
+        self.flights = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.lock = threading.Lock()
+
+    def _drop(self, key):
+        generation, data = self.entries.pop(key)
+        self.size -= len(data)
+
+    def _lookup(self, key, generation):
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == generation:
+            self.entries.move_to_end(key)
+            return entry[1]
+        if entry is not None:
+            self._drop(key)
+        return None
+
+    def get(self, key, generation):
+        with self.lock:
+            data = self._lookup(key, generation)
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return data
+
+    def put(self, key, generation, data):
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (generation, data)
+            self.size += len(data)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns (the JSON of the query result, "HIT", "COALESCED" or "MISS").
+        compute is called on a miss and returns the result to serialize.
+        """
+        generation = self.store.version
+        flight_key = (key, generation)
+        flight = None
+        with self.lock:
+            data = self._lookup(key, generation)
+            if data is not None:
+                self.hits += 1
+                return data, "HIT"
+            if self.coalesce and flight_key in self.flights:
+                self.coalesced += 1
+                waiting = self.flights[flight_key]
+            else:
+                self.misses += 1
+                waiting = None
+                if self.coalesce:
+                    flight = self.flights[flight_key] = Flight()
+
+        if waiting is not None:
+            if waiting.done.wait(self.coalesce_wait) and waiting.data is not None:
+                return waiting.data, "COALESCED"
+            # The first request failed or is too slow, compute it here
+            return current_app.json.dumps(compute()), "MISS"
+
+        try:
+            data = current_app.json.dumps(compute())
+        finally:
+            if flight is not None:
+                with self.lock:
+                    del self.flights[flight_key]
+                flight.data = data
+                flight.done.set()
+        if self.store.version == generation:
+            self.put(key, generation, data)
+        return data, "MISS"
+
+    def metrics(self):
+        """
+        The counters in the Prometheus text format, for the /metrics endpoint
+        """
+        with self.lock:
+            return [
+                "# HELP api_query_cache_hits_total Query responses served from the cache.",
+                "# TYPE api_query_cache_hits_total counter",
+                f"api_query_cache_hits_total {self.hits}",
+                "# HELP api_query_cache_misses_total Query responses that had to be computed.",
+                "# TYPE api_query_cache_misses_total counter",
+                f"api_query_cache_misses_total {self.misses}",
+                "# HELP api_query_coalesced_total Query requests that waited for an identical request in flight.",
+                "# TYPE api_query_coalesced_total counter",
+                f"api_query_coalesced_total {self.coalesced}",
+                "# HELP api_query_cache_entries Query responses in the cache.",
+                "# TYPE api_query_cache_entries gauge",
+                f"api_query_cache_entries {len(self.entries)}",
+                "# HELP api_query_cache_bytes Size of the cached query responses in bytes.",
+                "# TYPE api_query_cache_bytes gauge",
+                f"api_query_cache_bytes {self.size}",
+            ]
+
+
+def init_query_cache(app, store):
+    """
+    Config:
+    QUERY_CACHE_SIZE - max number of cached query responses, 0 turns the cache off
+    QUERY_CACHE_MAX_BYTES - max total size of the cached responses
+    QUERY_COALESCING - identical queries running at the same time are computed once
+    QUERY_COALESCE_WAIT - seconds a query waits for an identical one before computing it itself
+    """
+    app.config.setdefault("QUERY_CACHE_SIZE", 256)
+    app.config.setdefault("QUERY_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+    app.config.setdefault("QUERY_COALESCING", True)
+    app.config.setdefault("QUERY_COALESCE_WAIT", 30)
+    max_entries = app.config["QUERY_CACHE_SIZE"]
+    cache = QueryCache(
+        store,
+        max_entries,
+        app.config["QUERY_CACHE_MAX_BYTES"] if max_entries else 0,
+        app.config["QUERY_COALESCING"],
+        app.config["QUERY_COALESCE_WAIT"],
+    )
+    app.extensions["query_cache"] = cache
+    if "metrics" in app.extensions:
+        app.extensions["metrics"].collectors.append(cache.metrics)
+    return cache
@@ -41,4 +41,8 @@ class ProductSchema(BaseModel):
 
 class BulkProductSchema(BaseModel):
     products: list[ProductSchema] = Field(embed=True)
-    # Other fields and validators as previously mentioned
\ No newline at end of file
+    # Other fields and validators as previously mentioned
+
+class BatchGetSchema(BaseModel):
+    # At most 1000 ids, so one request can't ask for the whole catalog
+    ids: list[int] = Field(min_length=1, max_length=1000)
@@ -0,0 +1,206 @@
+import heapq
+import math
+import re
+from bisect import bisect_left, insort
+
+from cowmap import CowMap
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# A word in the name counts as much as NAME_BOOST words in the description
+NAME_BOOST = 2
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# At most this many words are tried for the last (unfinished) word of a query
+MAX_PREFIX_EXPANSIONS = 50
+# A match with a typo or on a prefix scores less than an exact match
+PREFIX_WEIGHT = 0.8
+TYPO_WEIGHT = 0.6
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def allowed_typos(token):
+    """
+    Short words have to match exactly, longer words may have one or two typos
+    """
+    if len(token) < 4:
+        return 0
+    if len(token) < 8:
+        return 1
+    return 2
+
+
+def edit_distance(a, b, limit):
+    """
+    Levenshtein distance between a and b, or limit + 1 if it is more than limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class SearchIndex:
+    """
+    An inverted index over the name and description of the products, ranked with BM25.
+    postings maps a word to {product id: weighted count of the word in the product}.
+    It is changed together with the store and copied with it for snapshots, a copy shares the
+    posting dicts until one side writes to them (copy on write), like CowMap.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self._owned = set()
+        self.lengths = CowMap()
+        self.total_length = 0
+        self.vocabulary = []
+
+    def copy(self):
+        other = SearchIndex()
+        other.postings = dict(self.postings)
+        other.lengths = self.lengths.copy()
+        other.total_length = self.total_length
+        other.vocabulary = list(self.vocabulary)
+        self._owned = set()
+        return other
+
+    def rebuild(self, products):
+        self.__init__()
+        for product in products:
+            self.add(product)
+
+    def _terms(self, product):
+        terms = {}
+        for token in tokenize(product.get("name")):
+            terms[token] = terms.get(token, 0) + NAME_BOOST
+        for token in tokenize(product.get("description")):
+            terms[token] = terms.get(token, 0) + 1
+        return terms
+
+    def _posting_for_write(self, token):
+        posting = self.postings.get(token)
+        if posting is None:
+            posting = self.postings[token] = {}
+            insort(self.vocabulary, token)
+        elif token not in self._owned:
+            posting = self.postings[token] = dict(posting)
+        self._owned.add(token)
+        return posting
+
+    def add(self, product):
+        terms = self._terms(product)
+        for token, count in terms.items():
+            self._posting_for_write(token)[product["id"]] = count
+        length = sum(terms.values())
+        self.lengths[product["id"]] = length
+        self.total_length += length
+
+    def remove(self, product):
+        for token in self._terms(product):
+            posting = self._posting_for_write(token)
+            posting.pop(product["id"], None)
+            if not posting:
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+        self.total_length -= self.lengths.pop(product["id"], 0)
+
+    def _with_prefix(self, prefix):
+        start = bisect_left(self.vocabulary, prefix)
+        matches = []
+        for token in self.vocabulary[start:start + MAX_PREFIX_EXPANSIONS + 1]:
+            if not token.startswith(prefix):
+                break
+            if token != prefix:
+                matches.append(token)
+        return matches
+
+    def _with_typos(self, token):
+        """
+        Words within the allowed edit distance, they have to start with the same letter so only
+        a small part of the vocabulary is compared
+        """
+        limit = allowed_typos(token)
+        if not limit:
+            return []
+        start = bisect_left(self.vocabulary, token[0])
+        matches = []
+        for candidate in self.vocabulary[start:]:
+            if candidate[0] != token[0]:
+                break
+            if candidate != token and edit_distance(token, candidate, limit) <= limit:
+                matches.append(candidate)
+        return matches
+
+    def expand(self, token, last, fuzzy):
+        """
+        Returns {word in the index: weight} for a word of a query.
+        The last word of a query also matches longer words (autocomplete), a word that is not in
+        the index matches words with a typo if fuzzy is on
+        """
+        words = {}
+        if token in self.postings:
+            words[token] = 1.0
+        if last:
+            for word in self._with_prefix(token):
+                words[word] = PREFIX_WEIGHT
+        if not words and fuzzy:
+            for word in self._with_typos(token):
+                words[word] = TYPO_WEIGHT
+        return words
+
+    def search(self, query, limit=50, fuzzy=True):
+        """
+        Returns the ids of the best limit products that match every word of the query, best first
+        """
+        return [product_id for product_id, score in self.ranked(query, limit, fuzzy)]
+
+    def ranked(self, query, limit=50, fuzzy=True):
+        """
+        Like search, but returns (id, score) pairs
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or not len(self.lengths):
+            return []
+        expanded = [self.expand(token, index == len(tokens) - 1, fuzzy) for index, token in enumerate(tokens)]
+        if not all(expanded):
+            return []
+
+        # Every word has to match, so start with the word that matches the fewest products
+        candidates_per_word = []
+        for words in expanded:
+            ids = set()
+            for word in words:
+                ids.update(self.postings[word])
+            candidates_per_word.append(ids)
+        candidates_per_word.sort(key=len)
+        candidates = candidates_per_word[0]
+        for ids in candidates_per_word[1:]:
+            candidates &= ids
+            if not candidates:
+                return []
+
+        count = len(self.lengths)
+        average_length = self.total_length / count
+        scores = dict.fromkeys(candidates, 0.0)
+        for words in expanded:
+            for word, weight in words.items():
+                posting = self.postings[word]
+                idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for product_id in candidates:
+                    frequency = posting.get(product_id)
+                    if frequency:
+                        norm = K1 * (1 - B + B * self.lengths.get(product_id) / average_length)
+                        scores[product_id] += weight * idf * frequency * (K1 + 1) / (frequency + norm)
+
+        return heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,140 @@
+import random
+
+from schemas import ProductSchema, Specification
+
+# The products the app starts with
+DEFAULT_PRODUCTS = [
+    {
+        "id": 1,
+        "name": "Laptop",
+        "price": 800.0,
+        "category": "Electronics",
+        "specification": {"color": "black", "weight": 1.5, "height": 2.0, "length": 15.0},
+        "description": "High performance laptop",
+        "stock": 0
+    },
+    {
+        "id": 2,
+        "name": "T-Shirt",
+        "price": 20.0,
+        "category": "Clothing",
+        "specification": {"color": "white", "weight": 0.2, "height": 1.0, "length": 5.0},
+        "description": "Cotton t-shirt",
+        "stock": 2
+    },
+    {
+        "id": 3,
+        "name": "Gaming Laptop",
+        "price": 20.0,
+        "category": "Electronics",
+        "specification": {"color": "white", "weight": 30.5, "height": 8.0, "length": 5.0},
+        "description": "Cool gaming laptop",
+        "stock": 4
+    }
+]
+
+# Named datasets, a list is used as it is and a number is the size of a generated catalog
+DATASETS = {
+    "default": DEFAULT_PRODUCTS,
+    "empty": [],
+    "small": 1_000,
+    "medium": 100_000,
+    "large": 1_000_000,
+}
+
+# How the generated products look per category:
+# share of the catalog, median price, (weight kg, height cm, length cm) ranges, adjectives, nouns
+CATEGORY_PROFILES = {
+    "Electronics": (0.30, 250.0, ((0.1, 15.0), (0.5, 60.0), (2.0, 80.0)),
+                    ["Gaming", "Wireless", "Smart", "Portable", "Ultra", "Pro", "Mini"],
+                    ["Laptop", "Phone", "Tablet", "Headphones", "Monitor", "Camera", "Speaker", "Keyboard", "Mouse"]),
+    "Clothing": (0.25, 35.0, ((0.1, 2.0), (0.5, 10.0), (10.0, 120.0)),
+                 ["Cotton", "Slim", "Classic", "Summer", "Winter", "Organic", "Casual"],
+                 ["T-Shirt", "Jeans", "Jacket", "Dress", "Sweater", "Hoodie", "Socks", "Cap"]),
+    "Home & Garden": (0.20, 60.0, ((0.2, 40.0), (2.0, 200.0), (5.0, 200.0)),
+                      ["Wooden", "Modern", "Outdoor", "Folding", "Ceramic", "Vintage"],
+                      ["Lamp", "Chair", "Table", "Plant Pot", "Garden Hose", "Rug", "Cushion", "Shelf"]),
+    "Toys & Games": (0.15, 25.0, ((0.05, 5.0), (1.0, 50.0), (2.0, 60.0)),
+                     ["Kids", "Family", "Electric", "Classic", "Wooden", "Magnetic"],
+                     ["Puzzle", "Board Game", "Robot", "Doll", "Race Car", "Blocks", "Kite"]),
+    "Beauty & Health": (0.10, 15.0, ((0.02, 1.5), (2.0, 30.0), (2.0, 15.0)),
+                        ["Natural", "Herbal", "Daily", "Sensitive", "Organic", "Fresh"],
+                        ["Cream", "Shampoo", "Serum", "Perfume", "Toothbrush", "Vitamins", "Soap"]),
+}
+
+# Dark and neutral colors are more common than bright ones
+COLOR_WEIGHTS = {"black": 20, "white": 18, "gray": 14, "blue": 12, "red": 8, "green": 7,
+                 "pink": 6, "orange": 5, "purple": 5, "yellow": 5}
+
+
+def generate_products(count, seed=0, start_id=1):
+    """
+    Returns count products that pass ProductSchema, with ids from start_id.
+    The same count and seed always give the same products.
+    Prices are log-normal around a median per category, about 10% of the products are
+    out of stock and about 30% have no description.
+    """
+    rng = random.Random(seed)
+    categories = ProductSchema.VALID_CATEGORIES
+    category_weights = [CATEGORY_PROFILES[category][0] for category in categories]
+    colors = [color for color in Specification.VALID_COLORS if color in COLOR_WEIGHTS]
+    color_weights = [COLOR_WEIGHTS[color] for color in colors]
+
+    products = []
+    for product_id in range(start_id, start_id + count):
+        category = rng.choices(categories, category_weights)[0]
+        share, median_price, sizes, adjectives, nouns = CATEGORY_PROFILES[category]
+        adjective = rng.choice(adjectives)
+        noun = rng.choice(nouns)
+        (min_weight, max_weight), (min_height, max_height), (min_length, max_length) = sizes
+
+        price = median_price * rng.lognormvariate(0, 0.6)
+        stock = 0 if rng.random() < 0.1 else int(rng.expovariate(1 / 40)) + 1
+
+        products.append({
+            "id": product_id,
+            "name": f"{adjective} {noun} {rng.randint(100, 9999)}",
+            "price": round(min(max(price, 0.01), 999999.99), 2),
+            "category": category,
+            "specification": {
+                "color": rng.choices(colors, color_weights)[0],
+                "weight": round(rng.uniform(min_weight, max_weight), 2),
+                "height": round(rng.uniform(min_height, max_height), 1),
+                "length": round(rng.uniform(min_length, max_length), 1),
+            },
+            "description": None if rng.random() < 0.3 else f"{adjective} {noun.lower()} for everyday use",
+            "stock": stock,
+        })
+    return products
+
+
+def dataset_size(name, size=None):
+    """
+    The number of products load_dataset(name, size) returns, None if it would raise
+    """
+    dataset = DATASETS.get(name)
+    if name == "generated":
+        return size
+    if isinstance(dataset, int):
+        return dataset if size is None else size
+    return None if dataset is None else len(dataset)
+
+
+def load_dataset(name="default", size=None, seed=0):
+    """
+    Returns the products of a named dataset.
+    "generated" makes a catalog of size products, size also overrides the size of the
+    generated named datasets.
+    """
+    if size is not None and size < 1:
+        raise ValueError("size has to be at least 1")
+    if name == "generated":
+        if size is None:
+            raise ValueError("The generated dataset needs a size")
+        return generate_products(size, seed)
+    if name not in DATASETS:
+        raise ValueError(f"Unknown dataset {name}. Allowed datasets are: generated, {', '.join(DATASETS)}")
+    dataset = DATASETS[name]
+    if isinstance(dataset, int):
+        return generate_products(dataset if size is None else size, seed)
+    return dataset
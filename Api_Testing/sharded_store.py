@@ -0,0 +1,243 @@
+"""
+A product store split into shards by product id, with the same methods as ProductStore.
+
+Point operations (get, update, delete, ...) go to the one shard that owns the id, listings
+and searches are sent to all shards at the same time and the results are merged.
+The shards can be ProductStores in this process, or store servers from shared_store.py in
+their own processes (one per core), which is what makes queries scale with cores:
+
+    python shared_store.py --address /tmp/shard0.sock --dataset large --shard 0/2
+    python shared_store.py --address /tmp/shard1.sock --dataset large --shard 1/2
+    FLASK_STORE_MODE=sharded FLASK_STORE_SHARD_ADDRESSES=/tmp/shard0.sock,/tmp/shard1.sock flask run
+"""
+import heapq
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+
+def shard_index(product_id, count):
+    """
+    The shard that owns a product. Ids are hashed instead of using the category, so an update
+    that changes the category never has to move the product to another shard.
+    """
+    return product_id % count
+
+
+class ShardedStore:
+    """
+    Splits the catalog over shards by shard_index.
+    Writes are serialized by the store lock (new ids are handed out across all shards), reads
+    go to the shards without it.
+    The shards have their own versions, so the store keeps its own catalog version and change
+    log from the changes the shards report to their listeners. It is the only writer of its
+    shards, a shard must not be shared by two ShardedStores.
+    """
+
+    def __init__(self, shards, products=None):
+        self.shards = list(shards)
+        self._pool = None
+        self._pool_pid = None
+        self.lock = threading.RLock()
+        self.listeners = []
+        self.version = 0
+        self.reset_version = 0
+        self._changes = OrderedDict()
+        # Shard listeners may run on other threads while a write holds the store lock
+        self._log_lock = threading.Lock()
+        self._resetting = False
+        for shard in self.shards:
+            shard.listeners.append(self._shard_changed)
+        if products is not None:
+            self.reset(products)
+
+    def _scatter(self, call, *args):
+        """
+        Calls call(shard, *args) for every shard in parallel, returns the results in shard order.
+        args are lists with one value per shard.
+        """
+        # The threads of a pool do not survive a fork, so every process makes its own
+        if self._pool_pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard")
+            self._pool_pid = os.getpid()
+        return list(self._pool.map(call, self.shards, *args))
+
+    def _shard(self, product_id):
+        return self.shards[shard_index(product_id, len(self.shards))]
+
+    def _shard_changed(self, kind, product_id, version, fields):
+        if kind == "reset":
+            # A shard that lost track of its changes, everything may have changed
+            if not self._resetting:
+                self._reset()
+            return
+        with self._log_lock:
+            self.version += 1
+            self._changes[product_id] = (self.version, kind == "delete")
+            self._changes.move_to_end(product_id)
+            for listener in self.listeners:
+                listener(kind, product_id, self.version, fields)
+
+    def _reset(self):
+        with self._log_lock:
+            self.version += 1
+            self.reset_version = self.version
+            self._changes = OrderedDict()
+            for listener in self.listeners:
+                listener("reset", None, self.version, [])
+
+    def __len__(self):
+        return sum(self._scatter(len))
+
+    def reset(self, products):
+        parts = [[] for _ in self.shards]
+        for product in products:
+            parts[shard_index(product["id"], len(self.shards))].append(product)
+        with self.lock:
+            self._resetting = True
+            try:
+                self._scatter(lambda shard, part: shard.reset(part), parts)
+            finally:
+                self._resetting = False
+            self._reset()
+
+    def all(self):
+        parts = self._scatter(lambda shard: shard.all())
+        return list(heapq.merge(*parts, key=lambda product: product["id"]))
+
+    def iter_all(self):
+        parts = self._scatter(lambda shard: shard.iter_all())
+        return heapq.merge(*parts, key=lambda product: product["id"])
+
+    def page_after(self, after_id, limit):
+        """
+        Every shard returns its first limit products after after_id, the first limit of those are returned
+        """
+        parts = self._scatter(lambda shard: shard.page_after(after_id, limit))
+        return list(islice(heapq.merge(*parts, key=lambda product: product["id"]), limit))
+
+    def get(self, product_id):
+        return self._shard(product_id).get(product_id)
+
+    def get_version(self, product_id):
+        """
+        The catalog version of the last change to the product
+        """
+        with self._log_lock:
+            change = self._changes.get(product_id)
+            reset_version = self.reset_version
+        if change is not None:
+            return None if change[1] else change[0]
+        return reset_version if self.get(product_id) is not None else None
+
+    def next_id(self):
+        return max(self._scatter(lambda shard: shard.next_id()))
+
+    def add(self, product, product_id=None):
+        with self.lock:
+            if product_id is None:
+                product_id = self.next_id()
+            return self._shard(product_id).add(product, product_id)
+
+    def update(self, product_id, data, kind="update"):
+        with self.lock:
+            return self._shard(product_id).update(product_id, data, kind)
+
+    def set_stock(self, product_id, quantity):
+        with self.lock:
+            return self._shard(product_id).set_stock(product_id, quantity)
+
+    def delete(self, product_id):
+        with self.lock:
+            return self._shard(product_id).delete(product_id)
+
+    def search_scored(self, query, limit=50, fuzzy=True):
+        """
+        Every shard ranks its own best limit products, the best limit of those are returned.
+        Scores use the word statistics of each shard, with ids spread evenly they are close to
+        the statistics of the whole catalog.
+        """
+        parts = self._scatter(lambda shard: shard.search_scored(query, limit, fuzzy))
+        return heapq.nsmallest(limit, (pair for part in parts for pair in part), key=lambda pair: (-pair[0], pair[1]["id"]))
+
+    def search(self, query, limit=50, fuzzy=True):
+        return [product for score, product in self.search_scored(query, limit, fuzzy)]
+
+    def changes_since(self, since, limit=None, after=None):
+        """
+        Same as ProductStore.changes_since, the products are read from the shards after the
+        changed ids were collected, so they can be newer than the returned version
+        """
+        with self._log_lock:
+            current = self.version
+            reset = since < self.reset_version or since > self.version
+            changed = []
+            if not reset and after is None:
+                for product_id, (version, deleted) in reversed(self._changes.items()):
+                    if version <= since:
+                        break
+                    changed.append((product_id, version, deleted))
+                changed.reverse()
+        if reset or after is not None:
+            version = current if reset else since
+            # One more than limit, to tell if there is another page
+            products = self.page_after(0 if reset else after, None if limit is None else limit + 1)
+            changes = {"version": version, "reset": reset, "more": version < current, "products": products, "deleted": []}
+            if limit is not None and len(products) > limit:
+                del products[limit:]
+                changes.update(more=True, after=products[-1]["id"])
+            return changes
+
+        version = current
+        if limit is not None and len(changed) > limit:
+            changed = changed[:limit]
+            version = changed[-1][1]
+        products = [self.get(product_id) for product_id, _, deleted in changed if not deleted]
+        return {
+            "version": version,
+            "reset": False,
+            "more": version < current,
+            "products": [product for product in products if product is not None],
+            "deleted": [product_id for product_id, _, deleted in changed if deleted],
+        }
+
+    def snapshot(self, name):
+        with self.lock:
+            infos = self._scatter(lambda shard: shard.snapshot(name))
+        return {"name": name, "size": sum(info["size"] for info in infos), "created": infos[0]["created"]}
+
+    def list_snapshots(self):
+        """
+        Only snapshots that every shard has are listed
+        """
+        snapshots = {}
+        for number, infos in enumerate(self._scatter(lambda shard: shard.list_snapshots())):
+            for info in infos:
+                if number == 0:
+                    snapshots[info["name"]] = dict(info, shards=1)
+                elif info["name"] in snapshots:
+                    snapshots[info["name"]]["size"] += info["size"]
+                    snapshots[info["name"]]["shards"] += 1
+        return [
+            {key: value for key, value in info.items() if key != "shards"}
+            for info in snapshots.values()
+            if info["shards"] == len(self.shards)
+        ]
+
+    def restore(self, name):
+        with self.lock:
+            if name not in {info["name"] for info in self.list_snapshots()}:
+                return False
+            self._resetting = True
+            try:
+                restored = all(self._scatter(lambda shard: shard.restore(name)))
+            finally:
+                self._resetting = False
+            self._reset()
+            return restored
+
+    def delete_snapshot(self, name):
+        with self.lock:
+            return any(self._scatter(lambda shard: shard.delete_snapshot(name)))
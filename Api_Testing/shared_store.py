@@ -0,0 +1,391 @@
+"""
+A product store shared by all worker processes of a prefork server.
+
+One store server process owns the catalog, the workers talk to it over a local socket.
+Start the server, then the workers with STORE_MODE=shared:
+
+    python shared_store.py --address /tmp/products.sock --dataset default
+    FLASK_STORE_MODE=shared FLASK_STORE_ADDRESS=/tmp/products.sock gunicorn -w 4 app:app
+"""
+import argparse
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from multiprocessing.managers import BaseManager
+
+from changefeed import ChangeFeed
+from seed import load_dataset
+from sharded_store import shard_index
+from store import ProductStore
+
+DEFAULT_AUTHKEY = b"products"
+VERSION_FORMAT = "q"
+VERSION_SIZE = struct.calcsize(VERSION_FORMAT)
+MISSING = object()
+
+
+class StoreService:
+    """
+    Runs in the store server and wraps the ProductStore for the workers.
+    Every change is published to a ChangeFeed, which the workers read to invalidate their
+    caches, and the catalog version is written to a small memory mapped file, so a worker can
+    see that its cache is old without asking the server.
+    """
+
+    def __init__(self, store, max_events=100_000, version_path=None):
+        self.store = store
+        self.feed = ChangeFeed(max_events)
+        if version_path is None:
+            handle, version_path = tempfile.mkstemp(prefix="products-version-")
+            os.close(handle)
+        self.version_path = version_path
+        with open(version_path, "wb") as file:
+            file.write(b"\0" * VERSION_SIZE)
+        self._version_file = open(version_path, "r+b")
+        self._version_map = mmap.mmap(self._version_file.fileno(), VERSION_SIZE)
+        self._write_version(store.version)
+        store.listeners.append(self._changed)
+
+    def _write_version(self, version):
+        struct.pack_into(VERSION_FORMAT, self._version_map, 0, version)
+
+    def _changed(self, kind, product_id, version, fields):
+        # The event has to be in the feed before a worker can see the new version
+        self.feed.publish(kind, product_id, version, fields)
+        self._write_version(version)
+
+    def get_version_path(self):
+        return self.version_path
+
+    def get_feed_position(self):
+        with self.store.lock:
+            return self.feed.last_id, self.store.version
+
+    def events_after(self, last_id, timeout=None):
+        return self.feed.events_after(last_id, timeout)
+
+    def size(self):
+        return len(self.store)
+
+    def get(self, product_id):
+        return self.store.get(product_id)
+
+    def get_version(self, product_id):
+        return self.store.get_version(product_id)
+
+    def all(self):
+        return self.store.all()
+
+    def page_after(self, after_id, limit):
+        return self.store.page_after(after_id, limit)
+
+    def next_id(self):
+        return self.store.next_id()
+
+    def add(self, product, product_id=None):
+        return self.store.add(product, product_id)
+
+    def update(self, product_id, data, kind="update"):
+        return self.store.update(product_id, data, kind)
+
+    def set_stock(self, product_id, quantity):
+        return self.store.set_stock(product_id, quantity)
+
+    def delete(self, product_id):
+        return self.store.delete(product_id)
+
+    def reset(self, products):
+        self.store.reset(products)
+
+    def search(self, query, limit=50, fuzzy=True):
+        return self.store.search(query, limit, fuzzy)
+
+    def search_scored(self, query, limit=50, fuzzy=True):
+        return self.store.search_scored(query, limit, fuzzy)
+
+    def changes_since(self, since, limit=None, after=None):
+        return self.store.changes_since(since, limit, after)
+
+    def snapshot(self, name):
+        return self.store.snapshot(name)
+
+    def list_snapshots(self):
+        return self.store.list_snapshots()
+
+    def restore(self, name):
+        return self.store.restore(name)
+
+    def delete_snapshot(self, name):
+        return self.store.delete_snapshot(name)
+
+
+class StoreManager(BaseManager):
+    pass
+
+
+StoreManager.register("store_service")
+
+
+class RemoteFeed:
+    """
+    The change feed of the store server, seen from a worker. It has the same last_id and
+    events_after as a ChangeFeed, and the event ids are the ones of the server, so a reader
+    can resume with its Last-Event-ID on any worker.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    @property
+    def last_id(self):
+        self.store._connect()
+        return self.store._service.get_feed_position()[0]
+
+    def events_after(self, last_id, timeout=None):
+        self.store._connect()
+        return self.store._service.events_after(last_id, timeout)
+
+
+class RemoteStore:
+    """
+    The worker side of the shared store, it has the same methods as ProductStore.
+    Reads are answered from a local cache. Before a read the catalog version in the shared
+    version file is compared with the version of the cache, if the catalog changed the new
+    events are fetched from the server and the changed products are dropped from the cache.
+    A background thread also waits for new events, so listeners (like the change feed of this
+    worker) hear about changes made by other workers.
+    The connection is made lazily in each process, so the store can be created before the fork.
+    """
+
+    def __init__(self, address, authkey=DEFAULT_AUTHKEY, heartbeat=15):
+        self.address = address
+        self.authkey = authkey
+        self.heartbeat = heartbeat
+        self.listeners = []
+        self.feed = RemoteFeed(self)
+        self._pid = None
+        self._sync_lock = threading.RLock()
+
+    def _connect(self):
+        if self._pid == os.getpid():
+            return
+        with self._sync_lock:
+            if self._pid == os.getpid():
+                return
+            manager = StoreManager(address=self.address, authkey=self.authkey)
+            manager.connect()
+            self._service = manager.store_service()
+            version_file = open(self._service.get_version_path(), "rb")
+            self._version_map = mmap.mmap(version_file.fileno(), VERSION_SIZE, access=mmap.ACCESS_READ)
+            version_file.close()
+            self._event_id, self._synced_version = self._service.get_feed_position()
+            self._clear_cache()
+            self._pid = os.getpid()
+            threading.Thread(target=self._follow_events, daemon=True).start()
+
+    def _clear_cache(self):
+        self._products = {}
+        self._all = None
+        self._size = None
+
+    def _shared_version(self):
+        return struct.unpack_from(VERSION_FORMAT, self._version_map, 0)[0]
+
+    def _apply(self, events):
+        with self._sync_lock:
+            if events is None:
+                # This worker fell behind the feed, everything it has cached may be old
+                self._clear_cache()
+                self._event_id, self._synced_version = self._service.get_feed_position()
+                for listener in self.listeners:
+                    listener("reset", None, self._synced_version, [])
+                return
+            for event in events:
+                if event["event_id"] <= self._event_id:
+                    continue
+                if event["type"] == "reset":
+                    self._clear_cache()
+                else:
+                    self._products.pop(event["id"], None)
+                    self._all = None
+                    self._size = None
+                self._event_id = event["event_id"]
+                self._synced_version = max(self._synced_version, event["version"])
+                for listener in self.listeners:
+                    listener(event["type"], event["id"], event["version"], event["fields"])
+
+    def _sync(self):
+        self._connect()
+        if self._shared_version() != self._synced_version:
+            with self._sync_lock:
+                if self._shared_version() != self._synced_version:
+                    self._apply(self._service.events_after(self._event_id))
+
+    def _follow_events(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            try:
+                events = self._service.events_after(self._event_id, self.heartbeat)
+            except (EOFError, OSError):
+                return
+            if events != []:
+                self._apply(events)
+
+    @property
+    def version(self):
+        self._sync()
+        return self._synced_version
+
+    def __len__(self):
+        self._sync()
+        size = self._size
+        if size is None:
+            event_id = self._event_id
+            size = self._service.size()
+            with self._sync_lock:
+                if self._event_id == event_id:
+                    self._size = size
+        return size
+
+    def get(self, product_id):
+        self._sync()
+        product = self._products.get(product_id, MISSING)
+        if product is not MISSING:
+            return product
+        # A value fetched while an event came in may already be old, so it is only cached if none did
+        event_id = self._event_id
+        product = self._service.get(product_id)
+        with self._sync_lock:
+            if self._event_id == event_id:
+                self._products[product_id] = product
+        return product
+
+    def all(self):
+        self._sync()
+        products = self._all
+        if products is None:
+            event_id = self._event_id
+            products = self._service.all()
+            with self._sync_lock:
+                if self._event_id == event_id:
+                    self._all = products
+        return list(products)
+
+    def iter_all(self, page_size=1000):
+        """
+        Yields all products in id order, fetched from the server page_size at a time so the whole
+        catalog is never in memory. Unlike ProductStore.iter_all this is not a snapshot, changes
+        made while paging may be seen.
+        """
+        self._connect()
+        after_id = 0
+        while True:
+            page = self._service.page_after(after_id, page_size)
+            if not page:
+                return
+            yield from page
+            after_id = page[-1]["id"]
+
+    def page_after(self, after_id, limit):
+        self._connect()
+        return self._service.page_after(after_id, limit)
+
+    def get_version(self, product_id):
+        self._connect()
+        return self._service.get_version(product_id)
+
+    def next_id(self):
+        self._connect()
+        return self._service.next_id()
+
+    def search(self, query, limit=50, fuzzy=True):
+        self._connect()
+        return self._service.search(query, limit, fuzzy)
+
+    def search_scored(self, query, limit=50, fuzzy=True):
+        self._connect()
+        return self._service.search_scored(query, limit, fuzzy)
+
+    def changes_since(self, since, limit=None, after=None):
+        self._connect()
+        return self._service.changes_since(since, limit, after)
+
+    def list_snapshots(self):
+        self._connect()
+        return self._service.list_snapshots()
+
+    def _write(self, method, *args):
+        self._connect()
+        result = getattr(self._service, method)(*args)
+        self._sync()
+        return result
+
+    def add(self, product, product_id=None):
+        return self._write("add", product, product_id)
+
+    def update(self, product_id, data, kind="update"):
+        return self._write("update", product_id, data, kind)
+
+    def set_stock(self, product_id, quantity):
+        return self._write("set_stock", product_id, quantity)
+
+    def delete(self, product_id):
+        return self._write("delete", product_id)
+
+    def reset(self, products):
+        return self._write("reset", products)
+
+    def snapshot(self, name):
+        return self._write("snapshot", name)
+
+    def restore(self, name):
+        return self._write("restore", name)
+
+    def delete_snapshot(self, name):
+        return self._write("delete_snapshot", name)
+
+
+def serve(address, authkey=DEFAULT_AUTHKEY, products=(), max_events=100_000, ready=None):
+    """
+    Runs the store server until the process is stopped.
+    ready is an optional Event that is set when the server accepts connections.
+    """
+    store = ProductStore(list(products))
+    store.snapshot("seed")
+    service = StoreService(store, max_events)
+
+    class ServerManager(BaseManager):
+        pass
+
+    ServerManager.register("store_service", callable=lambda: service)
+    if isinstance(address, str) and os.path.exists(address):
+        os.remove(address)
+    server = ServerManager(address=address, authkey=authkey).get_server()
+    if ready is not None:
+        ready.set()
+    server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Store server shared by the app worker processes")
+    parser.add_argument("--address", default="/tmp/products.sock", help="unix socket path the workers connect to")
+    parser.add_argument("--authkey", default=DEFAULT_AUTHKEY.decode(), help="shared secret of the server and the workers")
+    parser.add_argument("--dataset", default="default", help="seed dataset from seed.py")
+    parser.add_argument("--size", type=int, default=None, help="size of a generated dataset")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of a generated dataset")
+    parser.add_argument("--max-events", type=int, default=100_000, help="events kept for the worker caches")
+    parser.add_argument("--shard", default=None, help="INDEX/COUNT, serve only this shard of the dataset (see sharded_store.py)")
+    args = parser.parse_args(argv)
+
+    products = load_dataset(args.dataset, args.size, args.seed)
+    if args.shard:
+        index, count = (int(part) for part in args.shard.split("/"))
+        products = [product for product in products if shard_index(product["id"], count) == index]
+    print(f"serving {len(products)} products on {args.address}")
+    serve(args.address, args.authkey.encode(), products, args.max_events)
+
+
+if __name__ == "__main__":
+    main()
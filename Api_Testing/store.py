@@ -0,0 +1,265 @@
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+
+from cowmap import CowMap
+from search import SearchIndex
+
+class Snapshot:
+    """
+    The saved state of a store, the maps in it are never written to
+    """
+
+    def __init__(self, name, products, versions, search_index, max_id):
+        self.name = name
+        self.products = products
+        self.versions = versions
+        self.search_index = search_index
+        self.max_id = max_id
+        self.created = time.time()
+        self.size = len(products)
+
+    def info(self):
+        return {"name": self.name, "size": self.size, "created": self.created}
+
+
+class ProductStore:
+    """
+    Keeps the products of one app instance.
+    Products are kept in a CowMap by id, so listing returns them in id order, which is the
+    order they were created in. Product dicts are never changed after they are stored, an
+    update stores a new dict, so snapshots can share them.
+
+    Every change bumps the catalog version and the changed product gets that version.
+    The ids changed since the last reset are kept in change order (deleted ids as tombstones),
+    so the changes after a version can be found without looking at the whole catalog.
+    The search index is updated together with the products and saved in snapshots with them.
+    Listeners are called with (kind, product_id, version, fields) for every change, kind is
+    one of create, update, stock, delete or reset. They are called while the store is
+    locked, so they see the changes in version order.
+    """
+
+    def __init__(self, products=None):
+        self.lock = threading.RLock()
+        self.snapshots = {}
+        self.listeners = []
+        self.version = 0
+        self.reset_version = 0
+        self._products = CowMap()
+        self._versions = CowMap()
+        self._changes = OrderedDict()
+        self.search_index = SearchIndex()
+        self._max_id = None
+        self.reset(products or [])
+
+    def __len__(self):
+        return len(self._products)
+
+    def reset(self, products):
+        """
+        Replaces all products, the given dicts are copied
+        """
+        with self.lock:
+            self.version += 1
+            self._products = CowMap((product["id"], dict(product)) for product in products)
+            self._versions = CowMap((product_id, self.version) for product_id, product in self._products.items())
+            self._max_id = self._products.max_key()
+            self.search_index.rebuild(self._products.values())
+            self._reset()
+
+    def _reset(self):
+        self.reset_version = self.version
+        self._changes = OrderedDict()
+        for listener in self.listeners:
+            listener("reset", None, self.version, [])
+
+    def _changed(self, kind, product_id, fields):
+        self.version += 1
+        if kind == "delete":
+            self._versions.pop(product_id)
+        else:
+            self._versions[product_id] = self.version
+        self._changes[product_id] = (self.version, kind == "delete")
+        self._changes.move_to_end(product_id)
+        for listener in self.listeners:
+            listener(kind, product_id, self.version, fields)
+
+    def all(self):
+        with self.lock:
+            return list(self._products.values())
+
+    def iter_all(self):
+        """
+        Yields all products in id order without building a list of them. The products are read
+        from a copy of the map taken when this is called, so later changes are not seen.
+        """
+        with self.lock:
+            products = self._products.copy()
+        return products.values()
+
+    def page_after(self, after_id, limit):
+        """
+        The first limit products with an id greater than after_id, in id order
+        """
+        with self.lock:
+            return list(islice(self._products.values_after(after_id), limit))
+
+    def get(self, product_id):
+        return self._products.get(product_id)
+
+    def get_version(self, product_id):
+        """
+        The catalog version of the last change to the product
+        """
+        return self._versions.get(product_id)
+
+    def next_id(self):
+        """
+        The next id is the highest id + 1
+        """
+        if self._max_id is None:
+            return 1
+        return self._max_id + 1
+
+    def add(self, product, product_id=None):
+        """
+        Gives the product the next id (or product_id) and stores it, a product that already has
+        product_id is replaced
+        """
+        with self.lock:
+            product["id"] = self.next_id() if product_id is None else product_id
+            old = self._products.get(product["id"])
+            if old is not None:
+                self.search_index.remove(old)
+            self._products[product["id"]] = product
+            self._max_id = max(self._max_id or 0, product["id"])
+            self.search_index.add(product)
+            self._changed("create", product["id"], list(product))
+            return product
+
+    def update(self, product_id, data, kind="update"):
+        """
+        Updates the product with data, returns None if there is no product with the id
+        """
+        with self.lock:
+            old = self._products.get(product_id)
+            if old is None:
+                return None
+            product = {**old, **data}
+            self._products[product_id] = product
+            if old.get("name") != product.get("name") or old.get("description") != product.get("description"):
+                self.search_index.remove(old)
+                self.search_index.add(product)
+            self._changed(kind, product_id, [field for field in product if old.get(field) != product[field]])
+            return product
+
+    def set_stock(self, product_id, quantity):
+        return self.update(product_id, {"stock": quantity}, kind="stock")
+
+    def delete(self, product_id):
+        """
+        Returns True if the product was deleted
+        """
+        with self.lock:
+            product = self._products.pop(product_id)
+            if product is None:
+                return False
+            self.search_index.remove(product)
+            if product_id == self._max_id:
+                self._max_id = self._products.max_key()
+            self._changed("delete", product_id, [])
+            return True
+
+    def search(self, query, limit=50, fuzzy=True):
+        """
+        Returns the products matching every word of the query, best match first
+        """
+        with self.lock:
+            return [self._products.get(product_id) for product_id in self.search_index.search(query, limit, fuzzy)]
+
+    def search_scored(self, query, limit=50, fuzzy=True):
+        """
+        Like search, but returns (score, product) pairs, so results of several stores can be merged
+        """
+        with self.lock:
+            return [
+                (score, self._products.get(product_id))
+                for product_id, score in self.search_index.ranked(query, limit, fuzzy)
+            ]
+
+    def changes_since(self, since, limit=None, after=None):
+        """
+        Returns the products changed after the catalog version since and the deleted ids, oldest first.
+        With a limit only the first limit changes are returned, "version" is the version to continue
+        from and "more" tells if there are more changes. If since is from before the last reset or
+        restore, or from after the current version (the mirror synced with a store that was
+        restarted), "reset" is true and all products are returned.
+        The products of a reset are paged by id too: if there are more than limit, "after" is the
+        last id returned and the next page is asked for with the same since and that after.
+        """
+        with self.lock:
+            reset = since < self.reset_version or since > self.version
+            if reset or after is not None:
+                version = self.version if reset else since
+                # One more than limit, to tell if there is another page
+                page_size = None if limit is None else limit + 1
+                products = list(islice(self._products.values_after(0 if reset else after), page_size))
+                changes = {"version": version, "reset": reset, "more": version < self.version, "products": products, "deleted": []}
+                if limit is not None and len(products) > limit:
+                    del products[limit:]
+                    changes.update(more=True, after=products[-1]["id"])
+                return changes
+            changed = []
+            for product_id, (version, deleted) in reversed(self._changes.items()):
+                if version <= since:
+                    break
+                changed.append((product_id, version, deleted))
+            changed.reverse()
+
+            version = self.version
+            if limit is not None and len(changed) > limit:
+                changed = changed[:limit]
+                version = changed[-1][1]
+            return {
+                "version": version,
+                "reset": False,
+                "more": version < self.version,
+                "products": [self._products.get(product_id) for product_id, _, deleted in changed if not deleted],
+                "deleted": [product_id for product_id, _, deleted in changed if deleted],
+            }
+
+    def snapshot(self, name):
+        """
+        Saves the current state under name, takes about the same time for any number of products.
+        Returns the name, size and creation time of the snapshot.
+        """
+        with self.lock:
+            snapshot = Snapshot(name, self._products.copy(), self._versions.copy(), self.search_index.copy(), self._max_id)
+            self.snapshots[name] = snapshot
+            return snapshot.info()
+
+    def list_snapshots(self):
+        with self.lock:
+            return [snapshot.info() for snapshot in self.snapshots.values()]
+
+    def restore(self, name):
+        """
+        Goes back to the state saved under name, returns False if there is no such snapshot.
+        The catalog version keeps growing, so a restore counts as a reset for the listeners.
+        """
+        with self.lock:
+            snapshot = self.snapshots.get(name)
+            if snapshot is None:
+                return False
+            self.version += 1
+            self._products = snapshot.products.copy()
+            self._versions = snapshot.versions.copy()
+            self.search_index = snapshot.search_index.copy()
+            self._max_id = snapshot.max_id
+            self._reset()
+            return True
+
+    def delete_snapshot(self, name):
+        with self.lock:
+            return self.snapshots.pop(name, None) is not None
@@ -0,0 +1,79 @@
+import pytest
+
+from admission import TokenBucket
+from app import create_app
+from test_products import BULK_NEW_PRODUCTS
+
+
+@pytest.fixture()
+def app():
+    return create_app({
+        "TESTING": True,
+        "ADMISSION_ENABLED": True,
+        "ADMISSION_BUDGETS": {"default": (100.0, 100), "listing": (1.0, 2), "bulk": (1.0, 1)},
+        "ADMISSION_CONCURRENCY": {"bulk": 1},
+    })
+
+
+@pytest.mark.admission
+def test_token_bucket():
+    bucket = TokenBucket(rate=10.0, size=2)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert 0 < bucket.take() <= 0.1
+
+
+@pytest.mark.admission
+def test_listing_budget(client):
+    assert client.get("/products").status_code == 200
+    assert client.get("/products").status_code == 200
+    response = client.get("/products")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert "error" in response.json
+    # Cheap lookups have their own budget and still work
+    assert client.get("/products/1").status_code == 200
+
+
+@pytest.mark.admission
+def test_budget_per_client(client):
+    def post(address, client_id):
+        return client.post(
+            "/products/bulk",
+            json=BULK_NEW_PRODUCTS,
+            headers={"X-Client-Id": client_id},
+            environ_base={"REMOTE_ADDR": address},
+        ).status_code
+
+    assert post("10.0.0.1", "a") == 201
+    # A new X-Client-Id does not get a new budget
+    assert post("10.0.0.1", "b") == 429
+    assert post("10.0.0.2", "a") == 201
+
+
+@pytest.mark.admission
+def test_trusted_client_id_header(app, client):
+    app.config["TRUST_CLIENT_ID_HEADER"] = True
+    assert client.post("/products/bulk", json=BULK_NEW_PRODUCTS, headers={"X-Client-Id": "a"}).status_code == 201
+    assert client.post("/products/bulk", json=BULK_NEW_PRODUCTS, headers={"X-Client-Id": "a"}).status_code == 429
+    assert client.post("/products/bulk", json=BULK_NEW_PRODUCTS, headers={"X-Client-Id": "b"}).status_code == 201
+
+
+@pytest.mark.admission
+def test_concurrency_limit(app, client):
+    semaphore = app.extensions["admission"].limits["bulk"]
+    semaphore.acquire()
+    try:
+        response = client.post("/products/bulk", json=BULK_NEW_PRODUCTS)
+    finally:
+        semaphore.release()
+    assert response.status_code == 429
+    # The rejected request did not keep a slot
+    assert client.post("/products/bulk", json=BULK_NEW_PRODUCTS, environ_base={"REMOTE_ADDR": "10.0.0.3"}).status_code == 201
+
+
+@pytest.mark.admission
+def test_disabled_by_default():
+    client = create_app({"TESTING": True}).test_client()
+    for _ in range(30):
+        assert client.get("/products").status_code == 200
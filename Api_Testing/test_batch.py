@@ -0,0 +1,44 @@
+import pytest
+
+from seed import DEFAULT_PRODUCTS
+from test_products import UPDATED_PRODUCT
+
+
+@pytest.mark.batch
+def test_batch_get(client):
+    response = client.post("/products/batch", json={"ids": [3, 99, 1, 3]})
+    assert response.status_code == 200
+    data = response.json
+    assert data["products"] == [DEFAULT_PRODUCTS[2], DEFAULT_PRODUCTS[0]]
+    assert data["missing"] == [99]
+
+
+@pytest.mark.batch
+def test_batch_get_sees_changes(client):
+    client.post("/products/batch", json={"ids": [1, 2]})
+    client.put("/products/1", json=UPDATED_PRODUCT)
+    client.delete("/products/2")
+    data = client.post("/products/batch", json={"ids": [1, 2]}).json
+    assert data["products"][0]["name"] == "Asus Rog"
+    assert data["missing"] == [2]
+
+
+@pytest.mark.batch
+def test_batch_get_uses_cache(app, client):
+    client.post("/products/batch", json={"ids": [1]})
+    assert 1 in app.extensions["product_json"].entries
+
+
+@pytest.mark.batch
+def test_batch_get_400(client):
+    assert client.post("/products/batch", json={"ids": []}).status_code == 400
+    response = client.post("/products/batch", json={"ids": ["a"]})
+    assert response.status_code == 400
+    assert response.json[0]["loc"] == ["ids", 0]
+
+
+@pytest.mark.batch
+def test_batch_get_bare_list(client):
+    response = client.post("/products/batch", json=[1, 2])
+    assert response.status_code == 400
+    assert response.json[0]["type"] == "model_type"
@@ -0,0 +1,43 @@
+import pytest
+
+import benchmark
+
+
+@pytest.mark.benchmark
+def test_benchmark_runs_every_route():
+    results = benchmark.run(sizes=[50], max_iterations=3, log=lambda line: None)
+    routes = results["results"]["50"]
+    assert set(routes) == {name for name, call in benchmark.route_calls(50)}
+    for stats in routes.values():
+        assert stats["iterations"] >= 1
+        assert stats["ops_per_sec"] > 0
+        assert stats["p50_ms"] <= stats["p99_ms"]
+
+
+@pytest.mark.benchmark
+def test_benchmark_compare():
+    baseline = {"results": {"1000": {"detail": {"p50_ms": 1.0}, "list": {"p50_ms": 1.0}}}}
+    results = {"results": {"1000": {"detail": {"p50_ms": 1.1}, "list": {"p50_ms": 2.0}}}}
+    regressions = benchmark.compare(results, baseline, threshold=0.2)
+    assert [regression["route"] for regression in regressions] == ["list"]
+
+
+@pytest.mark.benchmark
+def test_benchmark_skips_query_cache(monkeypatch):
+    apps = []
+    create_app = benchmark.create_app
+
+    def recording_create_app(*args, **kwargs):
+        apps.append(create_app(*args, **kwargs))
+        return apps[-1]
+
+    monkeypatch.setattr(benchmark, "create_app", recording_create_app)
+    benchmark.run(sizes=[50], max_iterations=3, routes=["list"], log=lambda line: None)
+    cache = apps[0].extensions["query_cache"]
+    assert (cache.hits, len(cache.entries)) == (0, 0)
+
+
+@pytest.mark.benchmark
+def test_benchmark_delete_on_small_catalog():
+    results = benchmark.run(sizes=[50], max_iterations=60, time_budget=10, routes=["delete"], log=lambda line: None)
+    assert results["results"]["50"]["delete"]["iterations"] == 50
@@ -0,0 +1,100 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app import create_app
+from cowmap import CowMap
+from seed import DEFAULT_PRODUCTS, generate_products
+from test_products import NEW_PRODUCT
+
+
+@pytest.mark.catalog_io
+def test_export_ndjson(client):
+    response = client.get("/products/export?format=ndjson")
+    assert response.mimetype == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == DEFAULT_PRODUCTS
+
+
+@pytest.mark.catalog_io
+def test_export_csv(client):
+    response = client.get("/products/export")
+    assert response.mimetype == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["id"] for row in rows] == ["1", "2", "3"]
+    assert rows[0]["specification.color"] == DEFAULT_PRODUCTS[0]["specification"]["color"]
+    assert client.get("/products/export?format=xml").status_code == 400
+
+
+@pytest.mark.catalog_io
+def test_export_streams_in_chunks():
+    app = create_app({"EXPORT_CHUNK_ROWS": 100}, products=generate_products(1000))
+    response = app.test_client().get("/products/export?format=ndjson", buffered=False)
+    assert response.is_streamed
+    chunks = list(response.response)
+    assert len(chunks) == 10
+    assert sum(chunk.count(b"\n") for chunk in chunks) == 1000
+
+
+@pytest.mark.catalog_io
+@pytest.mark.parametrize("file_format", ["csv", "ndjson"])
+def test_round_trip(file_format):
+    products = generate_products(300)
+    exported = create_app(products=products).test_client().get(f"/products/export?format={file_format}").data
+
+    client = create_app({"IMPORT_BATCH_SIZE": 64}, products=[]).test_client()
+    report = client.post(f"/products/import?format={file_format}", data=exported).json
+    assert (report["rows"], report["created"], report["updated"], report["failed"]) == (300, 300, 0, 0)
+    assert report["rows_per_second"] > 0
+    assert client.get("/products").json == products
+
+
+@pytest.mark.catalog_io
+def test_import_upserts_and_reports_errors(client):
+    rows = [
+        dict(NEW_PRODUCT, id=2, name="Linen shirt"),
+        dict(NEW_PRODUCT, id=10),
+        dict(NEW_PRODUCT, price=-1),
+        dict(NEW_PRODUCT, id="x"),
+        dict(NEW_PRODUCT),
+    ]
+    body = "\n".join(json.dumps(row) for row in rows) + "\n{not json\n"
+    response = client.post("/products/import", data=body, content_type="application/x-ndjson")
+    report = response.json
+    assert response.status_code == 200
+    assert (report["rows"], report["created"], report["updated"], report["failed"]) == (6, 2, 1, 3)
+    assert [(error["row"], error["errors"][0]["loc"]) for error in report["errors"]] == [(3, ["price"]), (4, ["id"]), (6, [])]
+
+    assert client.get("/products/2").json["name"] == "Linen shirt"
+    assert client.get("/products/10").json["name"] == NEW_PRODUCT["name"]
+    # The row without an id gets the next id after the imported id 10
+    assert [product["id"] for product in client.get("/products").json] == [1, 2, 3, 10, 11]
+
+
+@pytest.mark.catalog_io
+def test_import_csv_with_content_type(client):
+    text = "id,name,price,category,stock,specification.color,specification.weight,specification.height,specification.length\n"
+    text += "7,Lamp,12.5,Home & Garden,3,white,1,30,10\n"
+    report = client.post("/products/import", data=text, content_type="text/csv").json
+    assert report["created"] == 1
+    product = client.get("/products/7").json
+    assert product["description"] is None
+    assert product["specification"]["weight"] == 1.0
+
+
+@pytest.mark.catalog_io
+def test_import_on_shards():
+    client = create_app({"STORE_MODE": "sharded", "STORE_SHARDS": 3}).test_client()
+    rows = [dict(NEW_PRODUCT, id=product_id) for product_id in (9, 5, 1)]
+    report = client.post("/products/import?format=ndjson", data="\n".join(json.dumps(row) for row in rows)).json
+    assert (report["created"], report["updated"]) == (2, 1)
+    assert [product["id"] for product in client.get("/products").json] == [1, 2, 3, 5, 9]
+
+
+@pytest.mark.catalog_io
+def test_cowmap_keeps_ids_sorted():
+    cow = CowMap(page_size=4)
+    for key in (9, 2, 7, 1, 3):
+        cow[key] = key
+    assert list(cow.items()) == [(1, 1), (2, 2), (3, 3), (7, 7), (9, 9)]
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from app import create_app
+from changefeed import ChangeFeed
+from test_products import NEW_PRODUCT, UPDATED_PRODUCT
+
+
+def read_events(response, count):
+    """
+    Reads count events from a streamed response
+    """
+    events = []
+    chunks = iter(response.response)
+    while len(events) < count:
+        chunk = next(chunks)
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.startswith("id:"):
+            lines = dict(line.split(": ", 1) for line in chunk.strip().split("\n"))
+            events.append((lines["event"], json.loads(lines["data"])))
+    response.close()
+    return events
+
+
+@pytest.mark.changefeed
+def test_ring_buffer():
+    feed = ChangeFeed(max_events=3)
+    for product_id in range(1, 6):
+        feed.publish("update", product_id, product_id, ["name"])
+    assert [event["id"] for event in feed.events_after(3)] == [4, 5]
+    assert feed.events_after(5) == []
+    assert feed.events_after(1) is None
+
+
+@pytest.mark.changefeed
+def test_stream_mutations(client):
+    client.post("/products", json=NEW_PRODUCT)
+    client.put("/products/1", json=UPDATED_PRODUCT)
+    client.put("/products/stock_update/2?quantity=10")
+    client.delete("/products/3")
+
+    response = client.get("/products/events", headers={"Last-Event-ID": "0"}, buffered=False)
+    assert response.mimetype == "text/event-stream"
+    events = read_events(response, 4)
+    assert [kind for kind, data in events] == ["create", "update", "stock", "delete"]
+    assert [data["id"] for kind, data in events] == [4, 1, 2, 3]
+    versions = [data["version"] for kind, data in events]
+    assert versions == sorted(versions)
+    assert events[2][1]["fields"] == ["stock"]
+    assert "name" in events[1][1]["fields"]
+
+
+@pytest.mark.changefeed
+def test_resume_from_last_event(client):
+    client.put("/products/stock_update/1?quantity=1")
+    client.put("/products/stock_update/2?quantity=2")
+    response = client.get("/products/events?last_event_id=1", buffered=False)
+    events = read_events(response, 1)
+    assert events[0][1]["id"] == 2
+
+
+@pytest.mark.changefeed
+def test_resync_when_behind():
+    client = create_app({"TESTING": True, "CHANGEFEED_MAX_EVENTS": 5}).test_client()
+    for quantity in range(6):
+        client.put(f"/products/stock_update/1?quantity={quantity}")
+    response = client.get("/products/events", headers={"Last-Event-ID": "0"}, buffered=False)
+    assert read_events(response, 1)[0][0] == "resync"
+
+
+@pytest.mark.changefeed
+def test_resync_after_restart(client):
+    feed = ChangeFeed()
+    for product_id in range(1, 4):
+        feed.publish("update", product_id, product_id, ["name"])
+    assert feed.events_after(50) is None
+
+    # A reader that saw event 50 before the server restarted
+    client.put("/products/stock_update/1?quantity=1")
+    response = client.get("/products/events", headers={"Last-Event-ID": "50"}, buffered=False)
+    assert read_events(response, 1)[0][0] == "resync"
@@ -0,0 +1,89 @@
+import pytest
+
+from seed import DEFAULT_PRODUCTS
+from test_products import NEW_PRODUCT, UPDATED_PRODUCT
+
+
+@pytest.mark.changes
+def test_full_sync(client):
+    data = client.get("/products/changes").json
+    assert data["reset"] is True
+    assert data["products"] == DEFAULT_PRODUCTS
+    assert data["deleted"] == []
+
+
+@pytest.mark.changes
+def test_delta_sync(client):
+    version = client.get("/products/changes").json["version"]
+    client.put("/products/1", json=UPDATED_PRODUCT)
+    client.post("/products", json=NEW_PRODUCT)
+    client.delete("/products/2")
+    client.put("/products/stock_update/1?quantity=3")
+
+    data = client.get(f"/products/changes?since={version}").json
+    assert data["reset"] is False
+    assert data["more"] is False
+    assert [product["id"] for product in data["products"]] == [4, 1]
+    assert data["products"][1]["stock"] == 3
+    assert data["deleted"] == [2]
+
+    nothing = client.get(f"/products/changes?since={data['version']}").json
+    assert nothing["products"] == [] and nothing["deleted"] == []
+    assert nothing["version"] == data["version"]
+
+
+@pytest.mark.changes
+def test_delta_sync_limit(client):
+    version = client.get("/products/changes").json["version"]
+    for product_id in (1, 2, 3):
+        client.put(f"/products/stock_update/{product_id}?quantity=9")
+
+    first = client.get(f"/products/changes?since={version}&limit=2").json
+    assert [product["id"] for product in first["products"]] == [1, 2]
+    assert first["more"] is True
+    rest = client.get(f"/products/changes?since={first['version']}&limit=2").json
+    assert [product["id"] for product in rest["products"]] == [3]
+    assert rest["more"] is False
+
+
+@pytest.mark.changes
+def test_sync_after_reset(client):
+    version = client.get("/products/changes").json["version"]
+    client.delete("/products/1")
+    client.get("/reset")
+    data = client.get(f"/products/changes?since={version}").json
+    assert data["reset"] is True
+    assert data["products"] == DEFAULT_PRODUCTS
+
+
+@pytest.mark.changes
+def test_changes_bad_since(client):
+    assert client.get("/products/changes?since=-1").status_code == 400
+
+
+@pytest.mark.changes
+def test_since_from_the_future_resets(client):
+    client.put("/products/stock_update/1?quantity=3")
+    data = client.get("/products/changes?since=500").json
+    assert data["reset"] is True
+    assert len(data["products"]) == len(DEFAULT_PRODUCTS)
+    assert data["version"] < 500
+
+
+@pytest.mark.changes
+def test_full_sync_limit(client):
+    first = client.get("/products/changes?limit=2").json
+    assert first["reset"] is True
+    assert first["more"] is True
+    assert [product["id"] for product in first["products"]] == [1, 2]
+
+    client.put("/products/stock_update/1?quantity=3")
+    rest = client.get(f"/products/changes?since={first['version']}&limit=2&after={first['after']}").json
+    assert rest["reset"] is False
+    assert [product["id"] for product in rest["products"]] == [3]
+    assert "after" not in rest
+    # The change made while paging comes next
+    assert rest["more"] is True
+    changed = client.get(f"/products/changes?since={rest['version']}").json
+    assert [product["id"] for product in changed["products"]] == [1]
+    assert changed["more"] is False
@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+from test_products import BULK_NEW_PRODUCTS, NEW_PRODUCT
+
+
+@pytest.mark.idempotency
+def test_retry_returns_first_response(client):
+    headers = {"Idempotency-Key": "abc"}
+    first = client.post("/products", json=NEW_PRODUCT, headers=headers)
+    retry = client.post("/products", json=NEW_PRODUCT, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.json == first.json
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.mimetype == "application/json"
+    assert len(client.get("/products").json) == 4
+
+
+@pytest.mark.idempotency
+def test_bulk_retry(client):
+    headers = {"Idempotency-Key": "bulk-1"}
+    first = client.post("/products/bulk", json=BULK_NEW_PRODUCTS, headers=headers)
+    retry = client.post("/products/bulk", json=BULK_NEW_PRODUCTS, headers=headers)
+    assert [product["id"] for product in retry.json] == [product["id"] for product in first.json] == [4, 5]
+    assert len(client.get("/products").json) == 5
+
+
+@pytest.mark.idempotency
+def test_key_with_other_body(client):
+    client.post("/products", json=NEW_PRODUCT, headers={"Idempotency-Key": "abc"})
+    response = client.post("/products", json=dict(NEW_PRODUCT, name="Other"), headers={"Idempotency-Key": "abc"})
+    assert response.status_code == 422
+
+
+@pytest.mark.idempotency
+def test_without_key(client):
+    client.post("/products", json=NEW_PRODUCT)
+    client.post("/products", json=NEW_PRODUCT)
+    assert len(client.get("/products").json) == 5
+
+
+@pytest.mark.idempotency
+def test_concurrent_retry_waits(app, monkeypatch):
+    store = app.extensions["store"]
+    original_add = store.add
+
+    def slow_add(product):
+        time.sleep(0.2)
+        return original_add(product)
+
+    monkeypatch.setattr(store, "add", slow_add)
+    responses = []
+
+    def post():
+        responses.append(app.test_client().post("/products", json=NEW_PRODUCT, headers={"Idempotency-Key": "k"}))
+
+    threads = [threading.Thread(target=post) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert {response.json["id"] for response in responses} == {4}
+    assert len(store) == 4
+
+
+@pytest.mark.idempotency
+def test_key_is_scoped_to_the_client_address(client):
+    headers = {"Idempotency-Key": "shared"}
+    client.post("/products", json=NEW_PRODUCT, headers=dict(headers, **{"X-Client-Id": "a"}))
+    retry = client.post("/products", json=NEW_PRODUCT, headers=dict(headers, **{"X-Client-Id": "b"}))
+    assert retry.headers.get("Idempotent-Replayed") == "true"
+    other = client.post("/products", json=NEW_PRODUCT, headers=headers, environ_base={"REMOTE_ADDR": "10.0.0.9"})
+    assert "Idempotent-Replayed" not in other.headers
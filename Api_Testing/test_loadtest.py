@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+import loadtest
+
+
+@pytest.fixture()
+def server_url(app):
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    thread.join()
+
+
+@pytest.mark.loadtest
+def test_parse_mix():
+    assert loadtest.parse_mix("detail=80, list=20") == {"detail": 80, "list": 20}
+
+
+@pytest.mark.loadtest
+def test_run_load(server_url):
+    mix = {"detail": 5, "list_filtered": 2, "search": 2, "create": 1, "delete": 1}
+    report = loadtest.run_load(server_url, mix, concurrency=4, duration=5, max_requests=60)
+    assert report["total"]["requests"] == 60
+    assert report["total"]["error_rate"] == 0
+    # A delete with nothing created yet is counted as a create, so delete may be missing
+    assert set(report) <= {*mix, "total"}
+    for route in report:
+        assert report[route]["p50_ms"] <= report[route]["p99_ms"]
+
+
+@pytest.mark.loadtest
+def test_run_load_unknown_route(server_url):
+    with pytest.raises(ValueError):
+        loadtest.run_load(server_url, {"nope": 1}, concurrency=1, max_requests=1)
+
+
+@pytest.mark.loadtest
+def test_run_load_delete_without_created(server_url):
+    # Nothing is queued for the first delete, it creates a product and is counted as a create
+    report = loadtest.run_load(server_url, {"delete": 1}, concurrency=1, max_requests=1)
+    assert report["create"]["requests"] == 1
+    assert "delete" not in report
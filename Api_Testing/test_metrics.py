@@ -0,0 +1,33 @@
+import logging
+
+import pytest
+
+
+@pytest.mark.metrics
+def test_metrics_endpoint(client):
+    client.get("/products/1")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert "# TYPE api_request_duration_seconds histogram" in body
+    assert 'api_request_duration_seconds_count{method="GET",route="/products/<int:product_id>"}' in body
+    assert 'api_requests_total{method="GET",route="/products/<int:product_id>",status="200"}' in body
+    assert "api_store_products " in body
+
+
+@pytest.mark.metrics
+def test_metrics_count_requests(app, client):
+    metrics = app.extensions["metrics"]
+    client.get("/")
+    client.get("/")
+    assert metrics.latency[("GET", "/")].count == 2
+
+
+@pytest.mark.metrics
+def test_slow_request_log(app, client, caplog):
+    app.config["SLOW_REQUEST_THRESHOLD"] = 0
+    with caplog.at_level(logging.WARNING, logger="api.slow_requests"):
+        client.get("/products?max_price=40")
+    assert "/products" in caplog.text
+    assert "max_price" in caplog.text
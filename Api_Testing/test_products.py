@@ -1,62 +1,132 @@
 import pytest
-import requests
 
-BASE_URL = "http://localhost:5000" 
+# Request payloads, also used by loadtest.py
+NEW_PRODUCT = {
+    "name": "Lenovo pro",
+    "price": 20.0,
+    "category": "Electronics",
+    "specification": {
+        "color": "white",
+        "weight": 30.5,
+        "height": 8.0,
+        "length": 5.0
+    },
+    "stock": 5
+}
+
+UPDATED_PRODUCT = {
+    "name": "Asus Rog",
+    "price": 20.0,
+    "category": "Electronics",
+    "specification": {
+        "color": "white",
+        "weight": 30.5,
+        "height": 8.0,
+        "length": 5.0
+    },
+    "stock": 5
+}
 
-@pytest.fixture()
-def reset_data():
-    requests.get(f"{BASE_URL}/reset")
-    return
+BULK_NEW_PRODUCTS = {
+    "products": [
+        {
+            "name": "Work laptop11111111",
+            "price": 20.0,
+            "category": "Electronics",
+            "specification": {
+                "color": "white",
+                "weight": 30.5,
+                "height": 8.0,
+                "length": 5.0
+            },
+            "stock": 0
+        },
+        {
+            "name": "Work laptop22222222",
+            "price": 20.0,
+            "category": "Electronics",
+            "specification": {
+                "color": "white",
+                "weight": 30.5,
+                "height": 8.0,
+                "length": 5.0
+            },
+            "stock": 0
+        }
+    ]
+}
+
+BULK_UPDATED_PRODUCTS = {
+    "products": [
+        {
+            "id": 1,
+            "description": "low performance",
+            "name": "Lenovo pro",
+            "price": 20.0,
+            "category": "Electronics",
+            "specification": {
+                "color": "white",
+                "weight": 30.5,
+                "height": 8.0,
+                "length": 5.0
+            },
+            "stock": 3
+        },
+        {
+            "id": 2,
+            "description": "high performance",
+            "name": "Macbook pro",
+            "price": 20.0,
+            "category": "Electronics",
+            "specification": {
+                "color": "white",
+                "weight": 30.5,
+                "height": 8.0,
+                "length": 5.0
+            },
+            "stock": 2
+        }
+    ]
+}
 
 @pytest.mark.status
-def test_status():
-    response = requests.get(f"{BASE_URL}")
+def test_status(client):
+    response = client.get("/")
     assert response.status_code == 200
 
 @pytest.mark.read
-def test_list_products():
-    response = requests.get(f"{BASE_URL}/products")
+def test_list_products(client):
+    response = client.get("/products")
     assert response.status_code == 200
-    assert isinstance(response.json(), list)
+    assert isinstance(response.json, list)
 
 @pytest.mark.read
-def test_list_products_with_max():
-    response = requests.get(f"{BASE_URL}/products?max_price=40")
-    assert len(response.json()) == 2
+def test_list_products_with_max(client):
+    response = client.get("/products?max_price=40")
+    assert len(response.json) == 2
 
 @pytest.mark.get
-def test_get_product_detail():
-    response = requests.get(f"{BASE_URL}/products/1")
+def test_get_product_detail(client):
+    response = client.get("/products/1")
     assert response.status_code == 200
-    assert isinstance(response.json(), dict)
-    assert response.json()["id"] == 1
-    assert response.json()["name"] == "Laptop"
+    assert isinstance(response.json, dict)
+    assert response.json["id"] == 1
+    assert response.json["name"] == "Laptop"
 
 @pytest.mark.get
-def test_get_product_detail_404():
-    response = requests.get(f"{BASE_URL}/products/4")
+def test_get_product_detail_404(client):
+    response = client.get("/products/4")
     assert response.status_code == 404
-    assert isinstance(response.json(), dict)
-    assert "message" in response.json() 
+    assert isinstance(response.json, dict)
+    assert "message" in response.json 
 
 @pytest.mark.post
-def test_create_product(reset_data):
-    new_product = {
-        "name": "Lenovo pro",
-        "price": 20.0,
-        "category": "Electronics",
-        "specification": {
-            "color": "white",
-            "weight": 30.5,
-            "height": 8.0,
-            "length": 5.0
-        },
-        "stock": 5
-    }
-    response = requests.post(f"{BASE_URL}/products", 
+def test_create_product(client):
+    new_product = NEW_PRODUCT
+    response = client.post("/products", 
                              json=new_product
                              )
-    data = response.json()
+    data = response.json
     assert response.status_code == 201
     assert isinstance(data, dict)
     assert "id" in data
@@ -66,12 +136,12 @@ def test_create_product(reset_data):
     assert "specification" in data
     assert "stock" in data
     
-    response2 = requests.get(f"{BASE_URL}/products")
-    assert len(response2.json()) == 4
+    response2 = client.get("/products")
+    assert len(response2.json) == 4
 
 @pytest.mark.post
 @pytest.mark.product_validation
-def test_create_product_color(reset_data):
+def test_create_product_color(client):
     new_product = {
         "name": "Laptop Asus Rog", 
         "price": 400.0, 
@@ -84,17 +154,17 @@ def test_create_product_color(reset_data):
         "description": "High performance laptop",
         "stock": 0
     }
-    response = requests.post(f"{BASE_URL}/products", json=new_product)
+    response = client.post("/products", json=new_product)
     assert response.status_code == 400
-    assert response.json()[0]["type"] == "value_error"
-    assert response.json()[0]["loc"] == [
+    assert response.json[0]["type"] == "value_error"
+    assert response.json[0]["loc"] == [
             "specification",
             "color"
         ]
     
 @pytest.mark.post
 @pytest.mark.product_validation
-def test_create_product_categori(reset_data):
+def test_create_product_categori(client):
     new_product = {
         "name": "Lenovo pro",
         "price": 20.0,
@@ -107,31 +177,20 @@ def test_create_product_categori(reset_data):
         },
         "stock": 5
     }
-    response = requests.post(f"{BASE_URL}/products", json=new_product)
+    response = client.post("/products", json=new_product)
     assert response.status_code == 400
-    assert response.json()[0]["type"] == "value_error"
-    assert response.json()[0]["loc"] == [
+    assert response.json[0]["type"] == "value_error"
+    assert response.json[0]["loc"] == [
             "category"
         ]
 
 @pytest.mark.put
-def test_update_product(reset_data):
-    new_product = {
-        "name": "Asus Rog",
-        "price": 20.0,
-        "category": "Electronics",
-        "specification": {
-            "color": "white",
-            "weight": 30.5,
-            "height": 8.0,
-            "length": 5.0
-        },
-        "stock": 5
-    }
-    response = requests.put(f"{BASE_URL}/products/1", 
+def test_update_product(client):
+    new_product = UPDATED_PRODUCT
+    response = client.put("/products/1", 
                              json=new_product
                              )
-    data = response.json()
+    data = response.json
     assert response.status_code == 200
     assert isinstance(data, dict)
     assert data["id"] == 1
@@ -140,13 +199,13 @@ def test_update_product(reset_data):
     assert data["category"] == "Electronics"
     assert data["stock"] == 5
 #  double checked   
-    response2 = requests.get(f"{BASE_URL}/products/1")  
-    data2 = response2.json()
+    response2 = client.get("/products/1")  
+    data2 = response2.json
     assert data2["name"] == "Asus Rog"   
 
 @pytest.mark.put
 @pytest.mark.product_validation
-def test_update_product_name_length(reset_data):
+def test_update_product_name_length(client):
     new_product = {
         "name": "A", # invalid length
         "price": 20.0,
@@ -159,15 +218,15 @@ def test_update_product_name_length(reset_data):
         },
         "stock": 5
     }
-    response = requests.put(f"{BASE_URL}/products/1", 
+    response = client.put("/products/1", 
                              json=new_product
                              )
-    data = response.json()
+    data = response.json
     assert response.status_code == 400
     assert data[0]["type"] == "string_too_short"
 
 @pytest.mark.put
-def test_update_product_404(reset_data):
+def test_update_product_404(client):
     new_product = {
         "name": "Asus Rog", 
         "price": 20.0,
@@ -180,94 +239,67 @@ def test_update_product_404(reset_data):
         },
         "stock": 5
     }
-    response = requests.put(f"{BASE_URL}/products/11111111", 
+    response = client.put("/products/11111111", 
                              json=new_product
                              )
-    data = response.json()
+    data = response.json
     assert response.status_code == 404
     assert "error" in data
 
 
 @pytest.mark.delete
-def test_delete_product(reset_data):
-    response = requests.delete(f"{BASE_URL}/products/2")
+def test_delete_product(client):
+    response = client.delete("/products/2")
     assert response.status_code == 204
-    response = requests.get(f"{BASE_URL}/products/2")
+    response = client.get("/products/2")
     assert response.status_code == 404
 
 
 @pytest.mark.delete
-def test_delete_product_404(reset_data):
-    response = requests.delete(f"{BASE_URL}/products/11111111")
-    data = response.json()
+def test_delete_product_404(client):
+    response = client.delete("/products/11111111")
+    data = response.json
     assert response.status_code == 404
     assert "error" in data
 
 
 @pytest.mark.get
-def test_search_product(reset_data):
-    response = requests.get(f"{BASE_URL}/products/search?search_query=Gaming Laptop")
-    data = response.json()
+def test_search_product(client):
+    response = client.get("/products/search?search_query=Gaming Laptop")
+    data = response.json
     assert response.status_code == 200
     assert data[0]["name"] == "Gaming Laptop"
     assert data[0]["category"] == "Electronics"
     assert data[0]["id"] == 3
 
 @pytest.mark.put
-def test_product_stock_update(reset_data):
-    response = requests.put(f"{BASE_URL}/products/stock_update/2?quantity=10")
+def test_product_stock_update(client):
+    response = client.put("/products/stock_update/2?quantity=10")
     assert response.status_code == 200
-    data = response.json()
+    data = response.json
     assert data["stock"] == 10
 
 @pytest.mark.put
-def test_product_stock_update_with_negative_quantity_400(reset_data):
-    response = requests.put(f"{BASE_URL}/products/stock_update/2?quantity=-10") 
+def test_product_stock_update_with_negative_quantity_400(client):
+    response = client.put("/products/stock_update/2?quantity=-10") 
     assert response.status_code == 400
-    data = response.json()
+    data = response.json
     assert "error" in data
 
 @pytest.mark.put
-def test_product_stock_update_invalid_id_404(reset_data):
-    response = requests.put(f"{BASE_URL}/products/stock_update/999?quantity=10") 
+def test_product_stock_update_invalid_id_404(client):
+    response = client.put("/products/stock_update/999?quantity=10") 
     assert response.status_code == 404
-    data = response.json()
+    data = response.json
     assert "error" in data
 
 
 @pytest.mark.post
-def test_create_product_bulk(reset_data):
-    new_products = {
-    "products": [
-        {
-            "name": "Work laptop11111111",
-            "price": 20.0,
-            "category": "Electronics",
-            "specification": {
-                "color": "white",
-                "weight": 30.5,
-                "height": 8.0,
-                "length": 5.0
-            },
-            "stock": 0
-        },
-        {
-            "name": "Work laptop22222222",
-            "price": 20.0,
-            "category": "Electronics",
-            "specification": {
-                "color": "white",
-                "weight": 30.5,
-                "height": 8.0,
-                "length": 5.0
-            },
-            "stock": 0
-        }
-    ]
-}
-    response = requests.post(f"{BASE_URL}/products/bulk", json= new_products)
+def test_create_product_bulk(client):
+    new_products = BULK_NEW_PRODUCTS
+    response = client.post("/products/bulk", json= new_products)
     assert response.status_code == 201
-    data = response.json()
+    data = response.json
     assert data[0]["id"] == 4
     assert data[0]["name"] == "Work laptop11111111" 
     assert data[0]["category"] == "Electronics" 
@@ -277,7 +309,7 @@ def test_create_product_bulk(reset_data):
 
 
 @pytest.mark.post
-def test_create_product_bulk_400(reset_data):
+def test_create_product_bulk_400(client):
     new_products = {
     "products": [
         {
@@ -306,9 +338,9 @@ def test_create_product_bulk_400(reset_data):
         }
     ]
 }
-    response = requests.post(f"{BASE_URL}/products/bulk", json= new_products)
+    response = client.post("/products/bulk", json= new_products)
     assert response.status_code == 400
-    data = response.json()
+    data = response.json
     assert data[0]["type"] == "string_too_short"
     assert data[0]["loc"] == ["products", 0,"name"]
     assert data[1]["type"] == "greater_than"
@@ -316,42 +348,11 @@ def test_create_product_bulk_400(reset_data):
     
 
 @pytest.mark.put
-def test_update_product_bulk(reset_data):
-    new_products = {
-    "products": [
-        {
-            "id": 1,
-            "description": "low performance",
-            "name": "Lenovo pro",
-            "price": 20.0,
-            "category": "Electronics",
-            "specification": {
-                "color": "white",
-                "weight": 30.5,
-                "height": 8.0,
-                "length": 5.0
-            },
-            "stock": 3
-        },
-        {
-            "id": 2,
-            "description": "high performance",
-            "name": "Macbook pro",
-            "price": 20.0,
-            "category": "Electronics",
-            "specification": {
-                "color": "white",
-                "weight": 30.5,
-                "height": 8.0,
-                "length": 5.0
-            },
-            "stock": 2
-        }
-    ]
-}
-    response = requests.put(f"{BASE_URL}/products/bulk_update", json= new_products)
+def test_update_product_bulk(client):
+    new_products = BULK_UPDATED_PRODUCTS
+    response = client.put("/products/bulk_update", json= new_products)
     assert response.status_code == 200
-    data = response.json()
+    data = response.json
     assert data[0]["id"] == 1
     assert data[0]["name"] == "Lenovo pro" 
     assert data[0]["category"] == "Electronics" 
@@ -359,8 +360,8 @@ def test_update_product_bulk(reset_data):
     assert data[1]["name"] == "Macbook pro"
     assert data[1]["category"] == "Electronics"
 # double checked
-    response2 = requests.get(f"{BASE_URL}/products")
-    data = response2.json()
+    response2 = client.get("/products")
+    data = response2.json
     assert data[0]["id"] == 1
     assert data[0]["name"] == "Lenovo pro"
     assert data[1]["id"] == 2
@@ -368,7 +369,7 @@ def test_update_product_bulk(reset_data):
 
 
 @pytest.mark.put
-def test_update_product_bulk_not_available_id(reset_data):
+def test_update_product_bulk_not_available_id(client):
     new_products = {
     "products": [
         {
@@ -401,21 +402,29 @@ def test_update_product_bulk_not_available_id(reset_data):
         }
     ]
 }
-    response = requests.put(f"{BASE_URL}/products/bulk_update", json= new_products)
+    response = client.put("/products/bulk_update", json= new_products)
     assert response.status_code == 200  # Since id number 1 is valid, it is updated successfully and receives status code 200.
-    data = response.json()
+    data = response.json
     assert data[0]["id"] == 1
     assert data[0]["name"] == "Lenovo pro" 
     assert data[0]["category"] == "Electronics"   
 # double checked by using get_product_detail
-    response2 = requests.get(f"{BASE_URL}/products/999")
+    response2 = client.get("/products/999")
     assert response2.status_code == 404
-    data = response2.json()
+    data = response2.json
     assert data["message"] == "No product found"
 
 
+@pytest.mark.put
+def test_update_product_bulk_invalid_id(client):
+    rows = [dict(BULK_UPDATED_PRODUCTS["products"][0], id=product_id) for product_id in ("1", None)]
+    response = client.put("/products/bulk_update", json={"products": rows})
+    assert response.status_code == 200
+    assert response.json == []
+
+
 # @pytest.mark.put
-# def test_update_product_bulk_400(reset_data):
+# def test_update_product_bulk_400(client):
 #     new_products = {
 #     "products": [
 #         {
@@ -448,9 +457,9 @@ def test_update_product_bulk_not_available_id(reset_data):
 #         }
 #     ]
 # }
-#     response = requests.put(f"{BASE_URL}/products/bulk_update", json= new_products)
+#     response = client.put("/products/bulk_update", json= new_products)
 #     assert response.status_code == 400
-#     data = response.json()
+#     data = response.json
 #     assert data[0]["type"] == "string_too_short"
 #     assert data[0]["loc"] == ["products", 0 ,"name"]  
 #     assert data[1]["type"] == "greater_than"
@@ -458,7 +467,7 @@ def test_update_product_bulk_not_available_id(reset_data):
 
 # for original code
 # @pytest.mark.put
-# def test_update_product_bulk_400(reset_data):
+# def test_update_product_bulk_400(client):
 #     new_products = [
 #     {
 #         "id": 1,
@@ -477,9 +486,9 @@ def test_update_product_bulk_not_available_id(reset_data):
 #         "stock": 2
 #     }
 #     ]
-#     response = requests.put(f"{BASE_URL}/products/bulk_update", json= new_products)
+#     response = client.put("/products/bulk_update", json= new_products)
 #     assert response.status_code == 400
-#     data = response.json()
+#     data = response.json
 #     assert data["type"] == "string_too_short"
 #     assert data["type"] == "greater_than"
     
@@ -490,7 +499,7 @@ def test_update_product_bulk_not_available_id(reset_data):
 
 
 # @pytest.mark.put
-# def test_update_product_bulk_400(reset_data):
+# def test_update_product_bulk_400(client):
 #     new_products = [
 #     {
 #         "id": 1,
@@ -509,15 +518,15 @@ def test_update_product_bulk_not_available_id(reset_data):
 #         "stock": 2
 #     }
 #     ]
-#     response = requests.put(f"{BASE_URL}/products/bulk_update", json= new_products)
+#     response = client.put("/products/bulk_update", json= new_products)
 #     assert response.status_code == 400
-#     data = response.json()
+#     data = response.json
 #     assert data[0]["type"] == "string_too_short"
 #     assert data[0]["loc"] == ["name"]  
     
 
 # @pytest.mark.put
-# def test_update_product_bulk_400(reset_data):
+# def test_update_product_bulk_400(client):
 #     new_products = [
 #     {
 #         "id": 1,
@@ -536,9 +545,9 @@ def test_update_product_bulk_not_available_id(reset_data):
 #         "stock": 2
 #     }
 #     ]
-#     response = requests.put(f"{BASE_URL}/products/bulk_update", json= new_products)
+#     response = client.put("/products/bulk_update", json= new_products)
 #     assert response.status_code == 400
-#     data = response.json()
+#     data = response.json
 
 #     corrected_data = []
 #     for error in data["errors"]:
@@ -552,7 +561,7 @@ def test_update_product_bulk_not_available_id(reset_data):
 
 # # other simple solution 
 # @pytest.mark.put
-# def test_update_product_bulk_400(reset_data):
+# def test_update_product_bulk_400(client):
 #     new_products = [
 #     {
 #         "id": 1,
@@ -571,9 +580,9 @@ def test_update_product_bulk_not_available_id(reset_data):
 #         "stock": 2
 #     }
 #     ]
-#     response = requests.put(f"{BASE_URL}/products/bulk_update", json= new_products)
+#     response = client.put("/products/bulk_update", json= new_products)
 #     assert response.status_code == 400
-#     data = response.json()
+#     data = response.json
 
 #     corrected_data = []
 #     for error in data:
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from app import create_app
+from seed import generate_products
+
+
+@pytest.fixture()
+def app(tmp_path):
+    return create_app({"TESTING": True, "PROFILING_ENABLED": True, "PROFILE_DIR": str(tmp_path)})
+
+
+@pytest.mark.profiling
+def test_profile_request(client, tmp_path):
+    response = client.put("/products/bulk_update", headers={"X-Profile": "1"}, json={"products": []})
+    assert response.status_code == 200
+    timing = response.headers["Server-Timing"]
+    for name in ("json_parsing", "validation", "store", "serialization", "total"):
+        assert f"{name};dur=" in timing
+    path = response.headers["X-Profile-File"]
+    assert os.path.exists(path)
+    with open(path[:-len(".prof")] + ".txt") as file:
+        assert "function calls" in file.read()
+
+
+@pytest.mark.profiling
+def test_profile_needs_header(client, tmp_path):
+    response = client.get("/products/1")
+    assert "Server-Timing" not in response.headers
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.profiling
+def test_profile_needs_config(app, client):
+    app.config["PROFILING_ENABLED"] = False
+    response = client.get("/products/1", headers={"X-Profile": "1"})
+    assert "Server-Timing" not in response.headers
+
+
+@pytest.mark.profiling
+def test_cached_listing_counts_phases_once(tmp_path):
+    app = create_app(
+        {"TESTING": True, "PROFILING_ENABLED": True, "PROFILE_DIR": str(tmp_path)},
+        products=generate_products(5000),
+    )
+    response = app.test_client().get("/products", headers={"X-Profile": "1"})
+    timing = dict(part.split(";dur=") for part in response.headers["Server-Timing"].split(", "))
+    timing = {name: float(duration) for name, duration in timing.items()}
+    assert timing["store"] + timing["serialization"] <= timing["total"]
@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+from app import create_app
+from seed import DEFAULT_PRODUCTS
+from test_products import NEW_PRODUCT
+
+
+@pytest.mark.query_cache
+def test_listing_is_cached(client):
+    first = client.get("/products?max_price=1000")
+    assert first.headers["X-Cache"] == "MISS"
+    second = client.get("/products?max_price=1000.0")
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json == first.json
+    assert client.get("/products").headers["X-Cache"] == "MISS"
+
+
+@pytest.mark.query_cache
+def test_search_is_cached(client):
+    assert client.get("/products/search?search_query=Gaming Laptop").headers["X-Cache"] == "MISS"
+    response = client.get("/products/search?search_query=gaming,  laptop")
+    assert response.headers["X-Cache"] == "HIT"
+    assert [product["id"] for product in response.json] == [3]
+    assert client.get("/products/search?search_query=gaming laptop&limit=5").headers["X-Cache"] == "MISS"
+
+
+@pytest.mark.query_cache
+def test_changes_invalidate(client):
+    assert len(client.get("/products").json) == len(DEFAULT_PRODUCTS)
+    client.post("/products", json=NEW_PRODUCT)
+    response = client.get("/products")
+    assert response.headers["X-Cache"] == "MISS"
+    assert len(response.json) == len(DEFAULT_PRODUCTS) + 1
+
+    client.put("/products/stock_update/1?quantity=0")
+    assert client.get("/products").headers["X-Cache"] == "MISS"
+    client.get("/reset")
+    assert len(client.get("/products").json) == len(DEFAULT_PRODUCTS)
+
+
+@pytest.mark.query_cache
+def test_bounded_and_metrics():
+    app = create_app({"QUERY_CACHE_SIZE": 2}, products=DEFAULT_PRODUCTS)
+    client = app.test_client()
+    for price in (100, 200, 300, 100):
+        client.get(f"/products?max_price={price}")
+    cache = app.extensions["query_cache"]
+    assert len(cache.entries) == 2
+    assert (cache.hits, cache.misses) == (0, 4)
+
+    client.get("/products?max_price=100")
+    body = client.get("/metrics").text
+    assert "api_query_cache_hits_total 1" in body
+    assert "api_query_cache_misses_total 4" in body
+    assert "api_query_cache_entries 2" in body
+
+
+@pytest.mark.query_cache
+def test_disabled():
+    client = create_app({"QUERY_CACHE_SIZE": 0}, products=DEFAULT_PRODUCTS).test_client()
+    client.get("/products")
+    assert client.get("/products").headers["X-Cache"] == "MISS"
+
+
+@pytest.mark.query_cache
+def test_identical_queries_are_coalesced():
+    app = create_app({"QUERY_CACHE_SIZE": 0}, products=DEFAULT_PRODUCTS)
+    cache = app.extensions["query_cache"]
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_query():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return DEFAULT_PRODUCTS
+
+    def request(results):
+        with app.app_context():
+            results.append(cache.get_or_compute(("list", None), slow_query))
+
+    results = []
+    leader = threading.Thread(target=request, args=(results,))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=request, args=(results,)) for _ in range(5)]
+    for thread in followers:
+        thread.start()
+    while cache.coalesced < 5:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(status for data, status in results) == ["COALESCED"] * 5 + ["MISS"]
+    assert len({data for data, status in results}) == 1
+    assert not cache.flights
+
+
+@pytest.mark.query_cache
+def test_failed_leader_does_not_block(app):
+    cache = app.extensions["query_cache"]
+
+    def broken():
+        raise RuntimeError("store is down")
+
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            cache.get_or_compute(("list", None), broken)
+        assert not cache.flights
+        assert cache.get_or_compute(("list", None), lambda: [])[1] == "MISS"
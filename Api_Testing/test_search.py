@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from search import SearchIndex, edit_distance, tokenize
+from seed import DEFAULT_PRODUCTS, generate_products
+from store import ProductStore
+
+
+def index_of(products):
+    index = SearchIndex()
+    index.rebuild(products)
+    return index
+
+
+@pytest.mark.search
+def test_tokenize():
+    assert tokenize("Gaming Laptop, 15-inch") == ["gaming", "laptop", "15", "inch"]
+    assert tokenize(None) == []
+
+
+@pytest.mark.search
+def test_edit_distance():
+    assert edit_distance("laptop", "labtop", 1) == 1
+    assert edit_distance("laptop", "lpatop", 1) == 2
+    assert edit_distance("laptop", "laptops", 2) == 1
+
+
+@pytest.mark.search
+def test_ranking_and_description():
+    index = index_of(DEFAULT_PRODUCTS)
+    assert index.search("laptop") == [1, 3]
+    assert index.search("gaming laptop") == [3]
+    # "performance" is only in the description of product 1
+    assert index.search("performance") == [1]
+    assert index.search("cotton shirt") == [2]
+
+
+@pytest.mark.search
+def test_prefix_and_typos():
+    index = index_of(DEFAULT_PRODUCTS)
+    assert index.search("gaming lap") == [3]
+    assert index.search("lapto") == [1, 3]
+    assert index.search("labtop") == [1, 3]
+    assert index.search("labtop", fuzzy=False) == []
+    assert index.search("xyz") == []
+
+
+@pytest.mark.search
+def test_index_follows_store():
+    store = ProductStore(DEFAULT_PRODUCTS)
+    store.snapshot("start")
+    store.update(3, {"name": "Office Chair", "description": "Ergonomic chair"})
+    store.delete(1)
+    assert store.search("laptop") == []
+    assert [product["id"] for product in store.search("chair")] == [3]
+    store.restore("start")
+    assert [product["id"] for product in store.search("laptop")] == [1, 3]
+    assert store.search("chair") == []
+
+
+@pytest.mark.search
+def test_limit_and_cost():
+    store = ProductStore(generate_products(20_000))
+    started = time.perf_counter()
+    results = store.search("wireless headphones", limit=10)
+    assert time.perf_counter() - started < 0.5
+    assert len(results) == 10
+    assert all("Headphones" in product["name"] for product in results)
+
+
+@pytest.mark.search
+def test_search_endpoint(client):
+    response = client.get("/products/search?search_query=laptop&limit=1")
+    assert [product["id"] for product in response.json] == [1]
+    assert client.get("/products/search").status_code == 400
+    assert client.get("/products/search?search_query=laptop&limit=0").status_code == 400
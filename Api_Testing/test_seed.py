@@ -0,0 +1,68 @@
+import pytest
+
+from app import create_app
+from schemas import ProductSchema
+from seed import DEFAULT_PRODUCTS, dataset_size, generate_products, load_dataset
+
+
+@pytest.mark.seed
+def test_generated_products_are_valid():
+    products = generate_products(500, seed=3)
+    assert [product["id"] for product in products] == list(range(1, 501))
+    for product in products:
+        ProductSchema(**product)
+    assert {product["category"] for product in products} == set(ProductSchema.VALID_CATEGORIES)
+
+
+@pytest.mark.seed
+def test_generated_products_are_deterministic():
+    assert generate_products(100, seed=1) == generate_products(100, seed=1)
+    assert generate_products(100, seed=1) != generate_products(100, seed=2)
+
+
+@pytest.mark.seed
+def test_load_dataset():
+    assert load_dataset("default") == DEFAULT_PRODUCTS
+    assert len(load_dataset("small")) == 1000
+    assert len(load_dataset("large", size=10)) == 10
+    with pytest.raises(ValueError):
+        load_dataset("nope")
+    with pytest.raises(ValueError):
+        load_dataset("generated")
+
+
+@pytest.mark.seed
+def test_app_boots_with_dataset():
+    app = create_app({"SEED_DATASET": "generated", "SEED_SIZE": 25})
+    response = app.test_client().get("/products")
+    assert len(response.json) == 25
+
+
+@pytest.mark.seed
+def test_reset_with_dataset(client):
+    response = client.get("/reset?dataset=generated&size=50&seed=2")
+    assert response.status_code == 200
+    assert len(client.get("/products").json) == 50
+
+    client.get("/reset")
+    assert client.get("/products").json == DEFAULT_PRODUCTS
+
+    response = client.get("/reset?dataset=nope")
+    assert response.status_code == 400
+    assert "error" in response.json
+
+
+@pytest.mark.seed
+def test_reset_size_is_bounded():
+    client = create_app({"TESTING": True, "RESET_MAX_SIZE": 100}).test_client()
+    for size in ("101", "0", "-5", "many"):
+        assert client.get(f"/reset?dataset=generated&size={size}").status_code == 400
+    assert client.get("/reset?dataset=small&size=0").status_code == 400
+    assert client.get("/reset?dataset=large").status_code == 400
+    assert create_app({"TESTING": True, "RESET_MAX_SIZE": 100, "SEED_SIZE": 500}).test_client().get(
+        "/reset?dataset=generated"
+    ).status_code == 400
+    assert client.get("/reset?dataset=generated&size=100").status_code == 200
+    with pytest.raises(ValueError):
+        load_dataset("small", size=0)
+    assert (dataset_size("large"), dataset_size("large", 10), dataset_size("default"), dataset_size("nope")) == (1_000_000, 10, 3, None)
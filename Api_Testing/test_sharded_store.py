@@ -0,0 +1,126 @@
+import multiprocessing
+
+import pytest
+
+from app import create_app
+from seed import DEFAULT_PRODUCTS, generate_products
+from shared_store import RemoteStore, serve
+from sharded_store import ShardedStore, shard_index
+from store import ProductStore
+from test_products import NEW_PRODUCT, UPDATED_PRODUCT
+
+
+def sharded_client(config=None):
+    return create_app({"TESTING": True, "STORE_MODE": "sharded", "STORE_SHARDS": 2, **(config or {})}).test_client()
+
+
+@pytest.mark.sharded_store
+def test_products_are_split_by_id():
+    products = generate_products(1000)
+    store = ShardedStore([ProductStore() for _ in range(4)], products)
+    assert len(store) == 1000
+    for number, shard in enumerate(store.shards):
+        assert all(shard_index(product["id"], 4) == number for product in shard.all())
+    assert store.all() == ProductStore(products).all()
+    assert store.get(500) == products[499]
+
+
+@pytest.mark.sharded_store
+def test_search_matches_single_store():
+    products = generate_products(2000)
+    single = ProductStore(products)
+    sharded = ShardedStore([ProductStore() for _ in range(3)], products)
+    for query in ("wireless", "cotton shirt", "lapt"):
+        expected = {product["id"] for product in single.search(query, limit=1000)}
+        assert {product["id"] for product in sharded.search(query, limit=1000)} == expected
+    results = sharded.search_scored("wireless", limit=10)
+    assert len(results) == 10
+    assert [score for score, product in results] == sorted((score for score, product in results), reverse=True)
+
+
+@pytest.mark.sharded_store
+def test_api_on_shards():
+    client = sharded_client()
+    assert len(client.get("/products").json) == len(DEFAULT_PRODUCTS)
+    created = client.post("/products", json=NEW_PRODUCT).json
+    assert created["id"] == 4
+    client.put("/products/1", json=UPDATED_PRODUCT)
+    client.delete("/products/2")
+    assert client.get("/products/1").json["name"] == "Asus Rog"
+    assert [product["id"] for product in client.get("/products").json] == [1, 3, 4]
+    assert [product["id"] for product in client.get("/products/search?search_query=laptop").json] == [3]
+
+    changes = client.get("/products/changes?since=0").json
+    assert changes["reset"] is True
+    delta = client.get(f"/products/changes?since={changes['version'] - 3}").json
+    assert [product["id"] for product in delta["products"]] == [4, 1]
+    assert delta["deleted"] == [2]
+
+    client.get("/reset")
+    assert client.get("/products").json == DEFAULT_PRODUCTS
+    assert client.get("/products/changes?since=0").json["reset"] is True
+
+
+@pytest.mark.sharded_store
+def test_snapshots_on_shards():
+    client = sharded_client({"STORE_SHARDS": 3})
+    assert client.post("/snapshots/before").json["size"] == len(DEFAULT_PRODUCTS)
+    client.delete("/products/3")
+    assert [snapshot["name"] for snapshot in client.get("/snapshots").json] == ["seed", "before"]
+    assert client.post("/snapshots/before/restore").status_code == 200
+    assert client.get("/products/3").status_code == 200
+    assert client.post("/snapshots/missing/restore").status_code == 404
+
+
+@pytest.fixture()
+def shard_addresses(tmp_path):
+    """
+    Runs two shard servers, each in its own process
+    """
+    addresses = []
+    processes = []
+    for number in range(2):
+        address = str(tmp_path / f"shard{number}.sock")
+        part = [product for product in DEFAULT_PRODUCTS if shard_index(product["id"], 2) == number]
+        ready = multiprocessing.Event()
+        process = multiprocessing.Process(target=serve, args=(address, b"test", part), kwargs={"ready": ready}, daemon=True)
+        process.start()
+        assert ready.wait(10)
+        addresses.append(address)
+        processes.append(process)
+    yield addresses
+    for process in processes:
+        process.terminate()
+        process.join()
+
+
+@pytest.mark.sharded_store
+def test_shard_servers(shard_addresses):
+    client = sharded_client({"STORE_SHARD_ADDRESSES": ",".join(shard_addresses), "STORE_AUTHKEY": "test"})
+    assert client.get("/products").json == DEFAULT_PRODUCTS
+    created = client.post("/products", json=NEW_PRODUCT).json
+    assert created["id"] == 4
+    assert RemoteStore(shard_addresses[0], b"test").get(4)["name"] == "Lenovo pro"
+    assert [product["id"] for product in client.get("/products/search?search_query=laptop").json] == [1, 3]
+    client.get("/reset")
+    assert client.get("/products/4").status_code == 404
+
+
+@pytest.mark.sharded_store
+def test_since_from_the_future_resets():
+    client = sharded_client()
+    client.put("/products/stock_update/1?quantity=3")
+    data = client.get("/products/changes?since=500").json
+    assert data["reset"] is True
+    assert len(data["products"]) == len(DEFAULT_PRODUCTS)
+
+
+@pytest.mark.sharded_store
+def test_full_sync_limit():
+    client = sharded_client({"STORE_SHARDS": 3})
+    first = client.get("/products/changes?limit=2").json
+    assert first["reset"] is True
+    assert [product["id"] for product in first["products"]] == [1, 2]
+    rest = client.get(f"/products/changes?since={first['version']}&limit=2&after={first['after']}").json
+    assert [product["id"] for product in rest["products"]] == [3]
+    assert rest["more"] is False
@@ -0,0 +1,116 @@
+import multiprocessing
+
+import pytest
+
+from app import create_app
+from seed import DEFAULT_PRODUCTS
+from shared_store import RemoteStore, serve
+from test_changefeed import read_events
+from test_products import NEW_PRODUCT, UPDATED_PRODUCT
+
+
+@pytest.fixture()
+def address(tmp_path):
+    """
+    Runs a store server in its own process
+    """
+    address = str(tmp_path / "products.sock")
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=serve, args=(address, b"test", DEFAULT_PRODUCTS), kwargs={"ready": ready}, daemon=True)
+    process.start()
+    assert ready.wait(10)
+    yield address
+    process.terminate()
+    process.join()
+
+
+def worker_client(address):
+    """
+    An app like the one in each worker process
+    """
+    config = {"TESTING": True, "STORE_MODE": "shared", "STORE_ADDRESS": address, "STORE_AUTHKEY": "test"}
+    return create_app(config).test_client()
+
+
+@pytest.mark.shared_store
+def test_workers_see_each_others_writes(address):
+    first = worker_client(address)
+    second = worker_client(address)
+    assert second.get("/products/1").json["name"] == "Laptop"
+    assert len(second.get("/products").json) == 3
+
+    first.put("/products/1", json=UPDATED_PRODUCT)
+    created = first.post("/products", json=NEW_PRODUCT).json
+    first.delete("/products/2")
+
+    assert second.get("/products/1").json["name"] == "Asus Rog"
+    assert second.get(f"/products/{created['id']}").json["name"] == "Lenovo pro"
+    assert second.get("/products/2").status_code == 404
+    assert [product["id"] for product in second.get("/products").json] == [1, 3, 4]
+
+
+@pytest.mark.shared_store
+def test_reads_are_cached(address):
+    store = RemoteStore(address, b"test")
+    assert store.get(1)["name"] == "Laptop"
+    store._service = None
+    # Answered from the cache, the version did not change so the server is not asked
+    assert store.get(1)["name"] == "Laptop"
+
+
+@pytest.mark.shared_store
+def test_listeners_hear_other_workers(address):
+    writer = RemoteStore(address, b"test")
+    reader = RemoteStore(address, b"test")
+    changes = []
+    reader.listeners.append(lambda *change: changes.append(change[:2]))
+    reader.get(1)
+    writer.set_stock(1, 5)
+    reader.get(1)
+    assert changes == [("stock", 1)]
+
+
+@pytest.mark.shared_store
+def test_shared_reset_and_snapshots(address):
+    client = worker_client(address)
+    client.delete("/products/1")
+    assert client.post("/snapshots/without-laptop").status_code == 201
+    client.get("/reset")
+    assert client.get("/products").json == DEFAULT_PRODUCTS
+    client.post("/snapshots/without-laptop/restore")
+    assert worker_client(address).get("/products/1").status_code == 404
+
+
+@pytest.mark.shared_store
+def test_event_ids_are_the_same_on_every_worker(address):
+    first = worker_client(address)
+    second = worker_client(address)
+    first.put("/products/stock_update/1?quantity=1")
+    second.put("/products/stock_update/2?quantity=2")
+    first.delete("/products/3")
+
+    events = read_events(first.get("/products/events?last_event_id=0", buffered=False), 3)
+    assert [data["id"] for kind, data in events] == [1, 2, 3]
+    # A reader that saw the first event and reconnects to the other worker
+    resumed = read_events(second.get("/products/events", headers={"Last-Event-ID": str(events[0][1]["event_id"])}, buffered=False), 2)
+    assert resumed == events[1:]
+
+
+@pytest.mark.shared_store
+def test_iter_all_pages_through_the_server(address):
+    store = RemoteStore(address, b"test")
+    store.add(dict(DEFAULT_PRODUCTS[0]))
+    pages = []
+    page_after = store._service.page_after
+
+    def recording_page_after(after_id, limit):
+        pages.append(after_id)
+        return page_after(after_id, limit)
+
+    store._service.page_after = recording_page_after
+    assert list(store.iter_all(page_size=2)) == store.all()
+    assert pages == [0, 2, 4]
+
+    client = worker_client(address)
+    lines = client.get("/products/export?format=ndjson").text.splitlines()
+    assert len(lines) == 4
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+
+from cowmap import CowMap
+from seed import DEFAULT_PRODUCTS, generate_products
+from store import ProductStore
+
+
+@pytest.mark.store
+def test_cow_map_copy_is_independent():
+    original = CowMap((key, key * 10) for key in range(5000))
+    copy = original.copy()
+    original[1] = -1
+    original.pop(4000)
+    copy[6000] = 60000
+    assert copy.get(1) == 10
+    assert 4000 in copy
+    assert 6000 not in original
+    assert len(original) == 4999
+    assert len(copy) == 5001
+    assert list(copy.values())[:3] == [0, 10, 20]
+
+
+@pytest.mark.store
+def test_cow_map_keeps_pages_sorted():
+    cow_map = CowMap([(5000, "b")])
+    cow_map[3] = "a"
+    assert list(cow_map.values()) == ["a", "b"]
+    assert cow_map.max_key() == 5000
+
+
+@pytest.mark.store
+def test_snapshot_restore():
+    store = ProductStore(DEFAULT_PRODUCTS)
+    store.snapshot("start")
+    store.update(1, {"name": "Changed"})
+    store.delete(3)
+    product = store.add(dict(DEFAULT_PRODUCTS[0]))
+    assert product["id"] == 3
+
+    assert store.restore("start")
+    assert store.all() == DEFAULT_PRODUCTS
+    assert store.next_id() == 4
+    assert not store.restore("missing")
+
+
+@pytest.mark.store
+def test_restore_time_does_not_grow_with_size():
+    store = ProductStore(generate_products(200_000))
+    started = time.perf_counter()
+    store.snapshot("big")
+    store.restore("big")
+    assert time.perf_counter() - started < 0.05
+
+
+@pytest.mark.store
+def test_snapshot_endpoints(client):
+    response = client.post("/snapshots/before")
+    assert response.status_code == 201
+    assert response.json["size"] == 3
+
+    client.delete("/products/1")
+    assert client.post("/snapshots/before/restore").status_code == 200
+    assert client.get("/products/1").status_code == 200
+
+    names = [snapshot["name"] for snapshot in client.get("/snapshots").json]
+    assert names == ["seed", "before"]
+    assert client.delete("/snapshots/before").status_code == 204
+    assert client.post("/snapshots/before/restore").status_code == 404
+
+
+@pytest.mark.store
+def test_reset_restores_seed(client):
+    client.put("/products/stock_update/1?quantity=50")
+    client.delete("/products/2")
+    client.get("/reset")
+    assert client.get("/products").json == DEFAULT_PRODUCTS
+
+
+@pytest.mark.store
+def test_versions():
+    store = ProductStore(DEFAULT_PRODUCTS)
+    changes = []
+    store.listeners.append(lambda *change: changes.append(change))
+    start = store.version
+    store.set_stock(2, 9)
+    product = store.add(dict(DEFAULT_PRODUCTS[0]))
+    store.delete(1)
+    assert store.get_version(2) == start + 1
+    assert store.get_version(product["id"]) == start + 2
+    assert store.get_version(1) is None
+    assert [change[:3] for change in changes] == [("stock", 2, start + 1), ("create", 4, start + 2), ("delete", 1, start + 3)]
+
+
+@pytest.mark.store
+def test_seed_snapshot_is_protected(app, client):
+    assert client.delete("/snapshots/seed").status_code == 403
+    assert client.post("/snapshots/seed").status_code == 403
+
+    # Without a seed snapshot /reset loads the dataset again
+    app.extensions["store"].delete_snapshot("seed")
+    client.delete("/products/2")
+    assert client.get("/reset").status_code == 200
+    assert client.get("/products").json == DEFAULT_PRODUCTS
+    assert client.get("/snapshots").json[0]["name"] == "seed"
+
+
+@pytest.mark.store
+def test_page_after():
+    store = ProductStore(generate_products(3000))
+    assert [product["id"] for product in store.page_after(1020, 10)] == list(range(1021, 1031))
+    assert [product["id"] for product in store.page_after(2998, 10)] == [2999, 3000]
+    assert store.page_after(3000, 10) == []